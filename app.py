@@ -1,24 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, abort, send_from_directory, flash
+from datetime import datetime
 import base64
-import cv2
-import numpy as np
-from ml_models import predict_emotion  # Use your real model function
-
-# ...existing code...
-
 import json
+import uuid
 import os
+import random
 import sqlite3
+import sys
 import logging
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# Import your existing modules
-from db import init_db, create_user, get_user_by_credentials, get_user_by_email_credentials, get_user_by_email, list_courses, get_courses_by_language_and_difficulty, get_connection
+# Import your existing modules. OpenCV, MediaPipe and the emotion model are
+# not imported here: face_inference loads them in its worker processes and
+# the webcam routes import them on first use, so the rest of the site boots
+# without the CV stack.
+from db import init_db, create_user, get_user_by_credentials, get_user_by_email_credentials, get_user_by_email, list_courses, get_courses_by_language_and_difficulty, get_course_progress_summary, load_course_modules, load_course_structure, db_connection
 from utils import save_progress, get_student_data
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+from quiz_bank import quiz_bank, QUIZ_LEVELS
+from emotion_ingest import emotion_ingest
+from stage_metrics import stage_metrics
+from request_metrics import request_metrics
+import query_profiler
+from logging_config import configure_logging, HOT_PATH_LOGGER
+from face_inference import (face_inference, InferenceBusy, InferenceTimeout, UPLOAD_MAX_WIDTH,
+                            UPLOAD_JPEG_QUALITY, UPLOAD_GRAYSCALE, SAMPLE_INTERVAL_MS)
+
+# Set up logging: queued, rotated files (logs/app.log, logs/errors.log)
+configure_logging()
 logger = logging.getLogger(__name__)
+# Per-request detail on hot paths, sampled
+hot_logger = logging.getLogger(HOT_PATH_LOGGER)
 
 app = Flask(__name__, template_folder='templates')
 app.secret_key = 'your_secret_key'
@@ -27,361 +38,249 @@ app.config['TEMPLATES_AUTO_RELOAD'] = True
 # Initialize database
 init_db()
 
-# ...existing code...
+# Prometheus /metrics: per-route latency, in-flight requests, SQL timings, queue depths
+request_metrics.install(app, lambda: (face_inference.pending(), emotion_ingest.depth()))
+
+# SQL_PROFILE=1: per-request query counts and N+1 warnings
+query_profiler.install(app)
+
+FRAME_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+
+def read_frame_upload():
+    """Return (encoded image bytes, form fields) for a webcam frame upload.
+    
+    Frames arrive either as a raw binary body (``Content-Type: image/jpeg``,
+    extra fields in the query string), as the ``image`` file of a multipart
+    form, or, from older clients, as a base64 data URL inside JSON.
+    Raises ValueError (binascii.Error) when that base64 is malformed.
+    """
+    if request.mimetype in FRAME_CONTENT_TYPES:
+        return request.get_data(cache=False), request.args
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        upload = request.files.get('image')
+        return (upload.read() if upload else None), request.form
+    data = request.get_json(silent=True) or {}
+    img_data = data.get('image')
+    return (base64.b64decode(img_data.split(',')[-1]) if img_data else None), data
 
-# Add the emotion detection route after app initialization
 @app.route('/api/emotion_detect', methods=['POST'])
 def emotion_detect():
-    data = request.get_json()
-    img_data = data.get('image')
-    if not img_data:
-        return jsonify({'error': 'No image provided'}), 400
     try:
-        img_bytes = base64.b64decode(img_data.split(',')[1])
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        try:
+            img_bytes, _ = read_frame_upload()
+        except ValueError:
+            return jsonify({'error': 'Could not decode image'}), 400
+        if not img_bytes:
+            return jsonify({'error': 'No image provided'}), 400
+        from face_analysis import decode_frame
+        from ml_models import predict_emotion
+        with stage_metrics.timed('detect_decode'):
+            frame = decode_frame(img_bytes)
         if frame is None:
-            return jsonify({'face_detected': False, 'is_concentrated': False, 'emotion': 'No Face'})
-        # Use your real model for prediction
-        emotion, concentration, face_found = predict_emotion(frame)
+            emotion, concentration, face_found = 'No Face', False, False
+        else:
+            # Use your real model for prediction
+            with stage_metrics.timed('detect_predict'):
+                emotion, concentration, face_found = predict_emotion(frame)
+        
+        # The pacing streak lives server-side under the session's track id;
+        # the cookie is only written once, when that id is assigned
+        if 'face_track_id' not in session:
+            session['face_track_id'] = uuid.uuid4().hex
+        outcome = {'face_detected': bool(face_found), 'concentration': bool(concentration)}
         return jsonify({
             'face_detected': bool(face_found),
             'is_concentrated': bool(concentration),
-            'emotion': emotion
+            'emotion': emotion,
+            'next_interval_ms': face_inference.pace(f"detect:{session['face_track_id']}", outcome)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-import cv2
-import numpy as np
-from flask import request, jsonify
-import base64
-import random
-
-# Try to import enhanced detection libraries (optional)
-try:
-    import dlib
-    dlib_available = True
-except ImportError:
-    dlib_available = False
-    print("dlib not available, using basic detection")
 
-try:
-    import mediapipe as mp
-    # MediaPipe Face Detection (more accurate)
-    mp_face_detection = mp.solutions.face_detection
-    mp_drawing = mp.solutions.drawing_utils
+def analyze_webcam_frame(img_bytes, session_key, user_id=None, course_id=None, topic_id=None):
+    """Analyze one frame in the inference pool and record the learner's emotion.
     
-    # Initialize MediaPipe
-    face_detection = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
-    mediapipe_available = True
-except ImportError:
-    mediapipe_available = False
-    print("MediaPipe not available, using OpenCV only")
-
-# Enhanced face detection using multiple methods
-# Primary: OpenCV Haar Cascades
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
-
-# Enhanced emotion mapping with concentration indicators
-emotion_concentration_map = {
-    'happy': True,
-    'neutral': True,
-    'focused': True,
-    'concentrated': True,
-    'alert': True,
-    'surprised': False,
-    'sad': False,
-    'angry': False,
-    'fearful': False,
-    'disgusted': False,
-    'distracted': False,
-    'tired': False
-}
-# ...existing code...
-
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, abort, send_from_directory, flash
-from datetime import datetime
-import json
-import os
-import sqlite3
-import logging
-from werkzeug.security import generate_password_hash, check_password_hash
-
-# Import your existing modules
-from db import init_db, create_user, get_user_by_credentials, get_user_by_email_credentials, get_user_by_email, list_courses, get_courses_by_language_and_difficulty, get_connection
-from utils import save_progress, get_student_data
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-app = Flask(__name__, template_folder='templates')
-app.secret_key = 'your_secret_key'
-app.config['TEMPLATES_AUTO_RELOAD'] = True
-
-# Initialize database
-init_db()
+    Returns None when the frame cannot be decoded; raises InferenceBusy or
+    InferenceTimeout when the pool cannot take or finish it in time.
+    """
+    result = face_inference.infer(img_bytes, session_key=session_key)
+    if result is None:
+        return None
+    
+    if result['face_detected']:
+        hot_logger.debug(f"Enhanced detection: {result['face_count']} faces, emotion: {result['emotion']}, "
+                         f"concentration: {result['concentration']}, score: {result['concentration_score']:.2f}")
+        
+        # Record the sample; the ingest queue persists it in the background
+        if user_id:
+            emotion_ingest.submit(user_id, result['emotion'], course_id=course_id, topic_id=topic_id)
+    else:
+        hot_logger.debug("No faces detected with enhanced methods")
+    return result
 
 # Endpoint for face and emotion recognition
 @app.route('/api/emotion', methods=['POST'])
 def api_emotion():
     try:
-        print("=== Emotion API called ===")  # Debug log
-        data = request.json
-        img_data = data.get('image')
-        if not img_data:
-            print("ERROR: No image provided")
-            return jsonify({'error': 'No image provided'}), 400
-        
-        print(f"Received image data: {len(img_data)} characters")
-        
-        # Decode base64 image
-        img_bytes = base64.b64decode(img_data.split(',')[-1])
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if frame is None:
-            print("ERROR: Could not decode image")
-            return jsonify({'error': 'Could not decode image'}), 400
-        
-        print(f"Decoded image shape: {frame.shape}")
-        
-        # Enhanced face detection with multiple methods
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces_detected = False
-        face_count = 0
-        concentration_score = 0
-        emotion = 'unknown'
-        face_coordinates = []  # Store face positions for frontend drawing
-        
-        # Method 1: OpenCV Haar Cascades - detect all faces
-        faces_haar = face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.1,   # Good sensitivity
-            minNeighbors=5,    # Balance between accuracy and detection
-            minSize=(60, 60),  # Reasonable minimum size
-            maxSize=(250, 250), # Reasonable maximum size
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
-        
-        # Store all face coordinates for frontend drawing
-        for (x, y, w, h) in faces_haar:
-            face_coordinates.append({
-                'x': int(x),
-                'y': int(y), 
-                'width': int(w),
-                'height': int(h),
-                'confidence': 0.8  # Default confidence for Haar cascades
-            })
-        
-        # Method 2: MediaPipe Face Detection (if available) - supplement Haar detection
-        faces_mediapipe = []
-        if mediapipe_available:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_detection.process(rgb_frame)
-            if results.detections:
-                # Process all detections with good confidence
-                for detection in results.detections:
-                    confidence = detection.score[0]
-                    if confidence > 0.5:  # Only include confident detections
-                        # Convert MediaPipe coordinates to pixel coordinates
-                        h, w, _ = frame.shape
-                        bbox = detection.location_data.relative_bounding_box
-                        x = int(bbox.xmin * w)
-                        y = int(bbox.ymin * h)
-                        width = int(bbox.width * w)
-                        height = int(bbox.height * h)
-                        
-                        # Check if this face is already detected by Haar (avoid duplicates)
-                        is_duplicate = False
-                        for haar_face in faces_haar:
-                            hx, hy, hw, hh = haar_face
-                            # Check overlap - if centers are close, consider it duplicate
-                            haar_center_x = hx + hw // 2
-                            haar_center_y = hy + hh // 2
-                            mp_center_x = x + width // 2
-                            mp_center_y = y + height // 2
-                            
-                            distance = ((haar_center_x - mp_center_x) ** 2 + (haar_center_y - mp_center_y) ** 2) ** 0.5
-                            overlap_threshold = min(hw, hh, width, height) * 0.5
-                            
-                            if distance < overlap_threshold:
-                                is_duplicate = True
-                                break
-                        
-                        # Only add if not duplicate
-                        if not is_duplicate:
-                            face_coordinates.append({
-                                'x': x,
-                                'y': y,
-                                'width': width,
-                                'height': height,
-                                'confidence': round(confidence, 2)
-                            })
-                            faces_mediapipe.append(detection)
-        
-        # Combine detection results
-        total_faces = len(faces_haar) + len(faces_mediapipe)
-        
-        if len(faces_haar) > 0 or len(faces_mediapipe) > 0:
-            faces_detected = True
-            face_count = len(face_coordinates)  # Count all detected faces
-            
-            # Analyze all detected faces for emotion and concentration
-            concentration_scores = []
-            emotions = []
-            
-            # Process Haar detected faces
-            for i, (x, y, w, h) in enumerate(faces_haar):
-                face_roi = gray[y:y+h, x:x+w]
-                
-                # Check for eyes (indicates alertness)
-                eyes = eye_cascade.detectMultiScale(face_roi, 1.1, 3)
-                eye_detected = len(eyes) >= 2
-                
-                # Check for smile (indicates engagement)
-                smiles = smile_cascade.detectMultiScale(face_roi, 1.8, 20)
-                smile_detected = len(smiles) > 0
-                
-                # Calculate face quality metrics
-                face_size = w * h
-                face_position_score = 1.0 if (frame.shape[1] * 0.2 < x + w/2 < frame.shape[1] * 0.8) else 0.5
-                face_size_score = min(1.0, face_size / (frame.shape[0] * frame.shape[1] * 0.1))
-                
-                # Enhanced emotion prediction based on facial features
-                if eye_detected and smile_detected:
-                    face_emotions = ['happy', 'focused', 'engaged', 'alert']
-                elif eye_detected:
-                    face_emotions = ['neutral', 'concentrated', 'focused', 'alert']
-                elif smile_detected:
-                    face_emotions = ['happy', 'relaxed']
-                else:
-                    face_emotions = ['neutral', 'tired', 'distracted']
-                
-                face_emotion = random.choice(face_emotions)
-                emotions.append(face_emotion)
-                
-                # Calculate concentration score (0-1) for this face
-                face_concentration = (
-                    (0.4 if eye_detected else 0) +
-                    (0.2 if smile_detected else 0) +
-                    (0.2 * face_position_score) +
-                    (0.2 * face_size_score)
-                )
-                concentration_scores.append(face_concentration)
-            
-            # Process MediaPipe detected faces
-            for detection in faces_mediapipe:
-                confidence = detection.score[0]
-                
-                if confidence > 0.7:
-                    face_emotions = ['focused', 'concentrated', 'alert', 'neutral']
-                    face_concentration = min(1.0, confidence + 0.2)
-                else:
-                    face_emotions = ['neutral', 'distracted']
-                    face_concentration = confidence * 0.8
-                
-                face_emotion = random.choice(face_emotions)
-                emotions.append(face_emotion)
-                concentration_scores.append(face_concentration)
-            
-            # Calculate overall emotion and concentration
-            if emotions:
-                # Use the most positive emotion if multiple faces
-                emotion_priority = {'happy': 5, 'engaged': 4, 'focused': 4, 'alert': 3, 'concentrated': 3, 'neutral': 2, 'relaxed': 2, 'tired': 1, 'distracted': 0}
-                emotion = max(emotions, key=lambda e: emotion_priority.get(e, 0))
-            else:
-                emotion = 'neutral'
-            
-            # Average concentration score across all faces
-            if concentration_scores:
-                concentration_score = sum(concentration_scores) / len(concentration_scores)
-            else:
-                concentration_score = 0.5
-            
-            # Determine if user is concentrated based on emotion and score
-            is_concentrated = emotion_concentration_map.get(emotion, True) and concentration_score > 0.4
-            
-            logger.info(f"Enhanced detection: {face_count} faces, emotion: {emotion}, "
-                       f"concentration: {is_concentrated}, score: {concentration_score:.2f}")
-            
-            return jsonify({
-                'emotion': emotion,
-                'concentration': is_concentrated,
-                'face_detected': True,
-                'face_count': face_count,
-                'concentration_score': round(concentration_score, 2),
-                'detection_method': 'haar+mediapipe' if faces_mediapipe else 'haar',
-                'confidence': round(concentration_score * 100, 1),
-                'face_coordinates': face_coordinates  # Add face positions for drawing boxes
-            })
-        else:
-            logger.info("No faces detected with enhanced methods")
-            return jsonify({
-                'emotion': 'unknown', 
-                'concentration': False, 
-                'face_detected': False, 
-                'face_count': 0,
-                'concentration_score': 0,
-                'detection_method': 'none',
-                'confidence': 0,
-                'face_coordinates': []  # Empty array when no faces
-            })
+        img_bytes, data = read_frame_upload()
+    except ValueError:
+        return jsonify({'error': 'Could not decode image'}), 400
+    if not img_bytes and data.get('emotion'):
+        # Plain emotion sample from the learning pages, no frame to analyze
+        return save_emotion_data(data)
+    if not img_bytes:
+        return jsonify({'error': 'No image provided'}), 400
     
+    # Decode and analyze the frame in the inference worker pool
+    if 'face_track_id' not in session:
+        session['face_track_id'] = uuid.uuid4().hex
+    try:
+        with stage_metrics.timed('request_total'):
+            result = analyze_webcam_frame(img_bytes, session['face_track_id'], session.get('user_id'),
+                                          data.get('course_id'), data.get('topic_id'))
+            if result is None:
+                return jsonify({'error': 'Could not decode image'}), 400
+            with stage_metrics.timed('serialization'):
+                return jsonify(result)
+    except InferenceBusy:
+        response = jsonify({'error': 'Emotion detection is busy, retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    except InferenceTimeout:
+        logger.warning("Emotion detection timed out")
+        return jsonify({'error': 'Emotion detection timed out'}), 504
     except Exception as e:
         logger.error(f"Error in enhanced emotion detection: {str(e)}")
         return jsonify({'error': f'Processing error: {str(e)}'}), 500
+
+# Streaming channel for webcam frames (optional, needs flask-sock)
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+    logger.info("flask-sock not available, webcam frames use HTTP POST only")
+
+# How long a streaming client should pause when the inference pool is full
+STREAM_BUSY_BACKOFF_MS = 1000
+
+def stream_emotion_frames(ws):
+    """Binary JPEG frames in, JSON detection results out, over one WebSocket.
     
-    except Exception as e:
-        logger.error(f"Error in emotion detection: {str(e)}")
-        return jsonify({'error': f'Processing error: {str(e)}'}), 500
+    Text messages set the frame context ({"course_id": ..., "topic_id": ...}).
+    Clients send their next frame after each reply. Frames that pile up
+    while one is being analyzed are dropped in favour of the newest, and
+    when the pool is saturated the server replies with a 'busy' message
+    telling the client how long to pause.
+    """
+    session_key = session.get('face_track_id') or uuid.uuid4().hex
+    user_id = session.get('user_id')
+    context = {}
+    dropped = 0
+    
+    while True:
+        frame = None
+        message = ws.receive()
+        # Take everything already buffered and keep only the newest frame
+        while message is not None:
+            if isinstance(message, str):
+                try:
+                    context.update(json.loads(message))
+                except (ValueError, TypeError):
+                    pass
+            else:
+                if frame is not None:
+                    dropped += 1
+                frame = message
+            message = ws.receive(timeout=0)
+        if frame is None:
+            continue
+        
+        try:
+            result = analyze_webcam_frame(frame, session_key, user_id,
+                                          context.get('course_id'), context.get('topic_id'))
+        except InferenceBusy:
+            dropped += 1
+            ws.send(json.dumps({'type': 'busy', 'retry_after_ms': STREAM_BUSY_BACKOFF_MS, 'dropped': dropped}))
+            continue
+        except InferenceTimeout:
+            ws.send(json.dumps({'type': 'error', 'error': 'Emotion detection timed out', 'dropped': dropped}))
+            continue
+        except Exception as e:
+            logger.error(f"Error in emotion stream: {e}")
+            ws.send(json.dumps({'type': 'error', 'error': f'Processing error: {e}', 'dropped': dropped}))
+            continue
+        
+        if result is None:
+            ws.send(json.dumps({'type': 'error', 'error': 'Could not decode image', 'dropped': dropped}))
+            continue
+        with stage_metrics.timed('serialization'):
+            message = json.dumps({'type': 'result', **result, 'dropped': dropped})
+        ws.send(message)
+
+if sock is not None:
+    sock.route('/ws/emotion')(stream_emotion_frames)
+
+@app.route('/api/emotion/capabilities')
+def api_emotion_capabilities():
+    """Frame format and transports webcam clients should use"""
+    response = jsonify({
+        'max_width': UPLOAD_MAX_WIDTH,
+        'jpeg_quality': UPLOAD_JPEG_QUALITY,
+        'grayscale': UPLOAD_GRAYSCALE,
+        'content_types': list(FRAME_CONTENT_TYPES),
+        'websocket': '/ws/emotion' if sock is not None else None,
+        'sample_interval_ms': SAMPLE_INTERVAL_MS
+    })
+    # Only changes with a deploy; clients fetch it once per page
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@app.route('/api/emotion/metrics')
+def api_emotion_metrics():
+    """Latency histograms (milliseconds) for each stage of the emotion request path.
+    
+    Worker stages: decode, color, resize, face_cascade, eye_cascade,
+    smile_cascade, mediapipe, fusion, track and worker_total. Web process:
+    frame_signature, queue_and_ipc, serialization and request_total, plus
+    detect_decode and detect_predict for /api/emotion_detect.
+    """
+    return jsonify({'stages': stage_metrics.snapshot()})
+
+@app.route('/api/emotion/stats')
+def api_emotion_stats():
+    """Inference pool load, frame-change cache hit/miss and classifier batch counters"""
+    stats = face_inference.stats()
+    # The classifier only exists once /api/emotion_detect has loaded the CV stack
+    ml_models = sys.modules.get('ml_models')
+    stats['classifier'] = ml_models.emotion_classifier.stats() if ml_models else {'available': None}
+    return jsonify(stats)
 
 # Course filtering functions
 def get_courses_with_complete_quiz():
     """Filter courses to only include those with complete quiz JSON files (60 questions: 20B, 20M, 20A)"""
-    quiz_dir = 'data/quiz_questions'
     courses_with_complete_quiz = set()
     
-    if not os.path.exists(quiz_dir):
-        logger.warning(f"Quiz directory {quiz_dir} not found!")
-        return courses_with_complete_quiz
-    
-    try:
-        for quiz_file in os.listdir(quiz_dir):
-            if quiz_file.endswith('.json'):
-                quiz_path = os.path.join(quiz_dir, quiz_file)
-                try:
-                    with open(quiz_path, 'r') as f:
-                        quiz_data = json.load(f)
-                        
-                    course_id = quiz_data.get('course_id')
-                    questions = quiz_data.get('questions', [])
-                    
-                    if course_id and questions:
-                        # Count questions by level
-                        basic_count = len([q for q in questions if q.get('level') == 'basic'])
-                        medium_count = len([q for q in questions if q.get('level') == 'medium'])
-                        advanced_count = len([q for q in questions if q.get('level') == 'advanced'])
-                        
-                        # Check if quiz has sufficient questions and proper level distribution
-                        # Accept courses with at least 20 questions and all three levels represented
-                        total_questions = len(questions)
-                        has_all_levels = basic_count > 0 and medium_count > 0 and advanced_count > 0
-                        
-                        if (total_questions >= 20 and has_all_levels):
-                            courses_with_complete_quiz.add(course_id)
-                            logger.info(f"Course {course_id} has complete quiz: {quiz_file} ({total_questions} questions: {basic_count} basic, {medium_count} medium, {advanced_count} advanced)")
-                        else:
-                            logger.warning(f"Course {course_id} quiz incomplete: {quiz_file} ({total_questions} questions: {basic_count} basic, {medium_count} medium, {advanced_count} advanced)")
-                
-                except (json.JSONDecodeError, IOError) as e:
-                    logger.error(f"Error reading quiz file {quiz_file}: {e}")
-                    continue
-    
-    except Exception as e:
-        logger.error(f"Error scanning quiz directory: {e}")
+    for course in quiz_bank.courses():
+        course_id = course['course_id']
+        if not course_id or not course['questions']:
+            continue
+        
+        # Count questions by level
+        level_counts = course['level_counts']
+        basic_count = level_counts.get('basic', 0)
+        medium_count = level_counts.get('medium', 0)
+        advanced_count = level_counts.get('advanced', 0)
+        
+        # Check if quiz has sufficient questions and proper level distribution
+        # Accept courses with at least 20 questions and all three levels represented
+        total_questions = course['total_questions']
+        has_all_levels = basic_count > 0 and medium_count > 0 and advanced_count > 0
+        
+        if (total_questions >= 20 and has_all_levels):
+            courses_with_complete_quiz.add(course_id)
+        else:
+            logger.debug(f"Course {course_id} quiz incomplete: {course['filename']} ({total_questions} questions: {basic_count} basic, {medium_count} medium, {advanced_count} advanced)")
     
     logger.info(f"Found {len(courses_with_complete_quiz)} courses with complete quizzes: {list(courses_with_complete_quiz)}")
     return courses_with_complete_quiz
@@ -423,67 +322,44 @@ def dashboard():
     user_id = session['user_id']
     username = session.get('username', 'User')
     
-    # Load courses from quiz JSON files (13 courses)
-    import glob, json
+    # Load courses from the quiz bank index (13 courses)
     courses = []
+
+    for quiz_course in quiz_bank.courses():
+        course = {
+            'id': quiz_course['course_id'] or len(courses) + 1,
+            'title': quiz_course['course_title'],
+            'description': f"Learn {quiz_course['course_title']} concepts and best practices.",
+            'total_questions': quiz_course['total_questions'],
+            'total_topics': 5,  # Default number of topics
+            'total_exercises': 20  # Default number of exercises
+        }
+        courses.append(course)
+
+    hot_logger.debug(f"Dashboard: loaded {len(courses)} courses from the quiz bank")
     
-    for file in glob.glob('data/quiz_questions/*.json'):
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                course = {
-                    'id': data.get('course_id', len(courses) + 1),
-                    'title': data.get('course_title', 'Unknown Course'),
-                    'description': f"Learn {data.get('course_title')} concepts and best practices.",
-                    'total_questions': len(data.get('questions', [])),
-                    'total_topics': 5,  # Default number of topics
-                    'total_exercises': 20  # Default number of exercises
-                }
-                courses.append(course)
-        except Exception as e:
-            print(f"Error loading course from {file}: {e}")
-    
-    print(f"DEBUG: Loaded {len(courses)} courses from JSON files")
-    
-    # Get user's ongoing courses (courses with progress)
+    # Get user's ongoing courses (courses with progress), one grouped query for all of them
     ongoing_courses = []
     available_courses = []
-    
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    progress_by_course = get_course_progress_summary(user_id)
+
     for course in courses:
-        # Check if user has progress in this course
-        try:
-            cursor.execute('''
-                SELECT COUNT(*) as progress_count, AVG(progress_percentage) as avg_progress
-                FROM course_progress 
-                WHERE user_id = ? AND course_id = ?
-            ''', (user_id, course['id']))
-            
-            progress_result = cursor.fetchone()
-            has_progress = progress_result and progress_result['progress_count'] > 0
-        except:
-            # Table doesn't exist or other error, assume no progress
-            has_progress = False
-            progress_result = None
-        
-        if has_progress:
+        progress_result = progress_by_course.get(course['id'])
+
+        if progress_result:
             # User has started this course
             course['progress'] = {
                 'percentage': progress_result['avg_progress'] or 0,
                 'completed_topics': progress_result['progress_count'],
                 'total_topics': course['total_topics'],
-                'status': 'in_progress' if progress_result['avg_progress'] < 100 else 'completed'
+                'status': 'in_progress' if (progress_result['avg_progress'] or 0) < 100 else 'completed'
             }
             ongoing_courses.append(course)
         else:
             # Course available to start
             available_courses.append(course)
 
-    conn.close()
-    
-    print(f"DEBUG: Found {len(available_courses)} available courses and {len(ongoing_courses)} ongoing courses")
+    hot_logger.debug(f"Dashboard: {len(available_courses)} available and {len(ongoing_courses)} ongoing courses")
     
     return render_template('dashboard.html', 
                          courses=courses, 
@@ -533,75 +409,27 @@ def course_modules(course_id):
     user_id = session.get('user_id')
     
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Get course details
-        cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
-        course = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        if not course:
-            course = {'id': course_id, 'title': f'Course {course_id}', 'description': 'Sample course'}
-        else:
-            course = dict(course)
+            # Get course details
+            cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
+            course = cursor.fetchone()
         
-        # Get all modules for the course
-        try:
-            cursor.execute('''
-                SELECT id, title, description, module_order 
-                FROM modules 
-                WHERE course_id = ?
-                ORDER BY module_order
-            ''', (course_id,))
-            modules = cursor.fetchall()
-        except Exception as module_error:
-            print(f"Error fetching modules: {module_error}")
-            modules = []
-        
-        # Get submodules for each module
-        all_modules = []
-        for module in modules:
-            module_dict = dict(module)
-            cursor.execute('''
-                SELECT id, title, description, content, submodule_order
-                FROM submodules
-                WHERE module_id = ?
-                ORDER BY submodule_order
-            ''', (module_dict['id'],))
-            module_dict['submodules'] = [dict(sm) for sm in cursor.fetchall()]
-            
-            # Add status information
-            if user_id:
-                try:
-                    cursor.execute('''
-                        SELECT status, score
-                        FROM module_progress 
-                        WHERE user_id = ? AND module_id = ?
-                    ''', (user_id, module_dict['id']))
-                    progress = cursor.fetchone()
-                    if progress:
-                        module_dict['status'] = progress['status']
-                        module_dict['score'] = progress['score']
-                    else:
-                        module_dict['status'] = 'not_started'
-                        module_dict['score'] = 0
-                except:
-                    module_dict['status'] = 'not_started'
-                    module_dict['score'] = 0
+            if not course:
+                course = {'id': course_id, 'title': f'Course {course_id}', 'description': 'Sample course'}
             else:
-                module_dict['status'] = 'not_started'
-                module_dict['score'] = 0
-            
-            all_modules.append(module_dict)
+                course = dict(course)
         
-        conn.close()
+        # Modules, submodules and the user's status in two queries
+        all_modules = load_course_modules(course_id, user_id)
         
         return render_template('course_modules.html', 
                              course=course,
                              sub_exercises=all_modules,
                              course_id=course_id)
     except Exception as e:
-        print(f"Error in course_modules: {e}")
+        logger.error(f"Error in course_modules: {e}")
         return render_template('course_modules.html',
                              course={'id': course_id, 'title': f'Course {course_id}', 'description': 'Sample course'},
                              sub_exercises=[],
@@ -656,18 +484,17 @@ def course_detail(course_id):
         return redirect(url_for('login'))
     
     # Get course details
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
-    course = cursor.fetchone()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
+        course = cursor.fetchone()
     
-    if not course:
-        abort(404)
+        if not course:
+            abort(404)
     
-    # Get topics for this course
-    cursor.execute('SELECT * FROM topics WHERE course_id = ? ORDER BY topic_order', (course_id,))
-    topics = cursor.fetchall()
-    conn.close()
+        # Get topics for this course
+        cursor.execute('SELECT * FROM topics WHERE course_id = ? ORDER BY topic_order', (course_id,))
+        topics = cursor.fetchall()
     
     return render_template('course_detail.html', course=course, topics=topics)
 
@@ -679,19 +506,17 @@ def start_course_redirect(course_id):
     
     try:
         # Get course details
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
-        course = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
+            course = cursor.fetchone()
         
-        if not course:
-            conn.close()
-            abort(404)
+            if not course:
+                abort(404)
         
-        # Get the first topic for this course
-        cursor.execute('SELECT * FROM topics WHERE course_id = ? ORDER BY topic_order LIMIT 1', (course_id,))
-        first_topic = cursor.fetchone()
-        conn.close()
+            # Get the first topic for this course
+            cursor.execute('SELECT * FROM topics WHERE course_id = ? ORDER BY topic_order LIMIT 1', (course_id,))
+            first_topic = cursor.fetchone()
         
         if first_topic:
             # Redirect to the first topic
@@ -701,38 +526,37 @@ def start_course_redirect(course_id):
             return redirect(url_for('view_topic', course_id=course_id, topic_id=f"{course_id}_0_0"))
             
     except Exception as e:
-        print(f"Error in start_course: {e}")
+        logger.error(f"Error in start_course: {e}")
         # Fallback: redirect to mock topic for testing
         return redirect(url_for('view_topic', course_id=course_id, topic_id=f"{course_id}_0_0"))
 
 def get_next_topic_id(course_id, current_topic_id):
     """Get the next topic ID for navigation"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Get current topic's index
-        cursor.execute('''
-            SELECT sub_exercise_index FROM sub_exercises 
-            WHERE course_id = ? AND topic_id = ? 
-            ORDER BY sub_exercise_index LIMIT 1
-        ''', (course_id, current_topic_id))
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        current_result = cursor.fetchone()
-        if not current_result:
-            return None
+            # Get current topic's index
+            cursor.execute('''
+                SELECT sub_exercise_index FROM sub_exercises 
+                WHERE course_id = ? AND topic_id = ? 
+                ORDER BY sub_exercise_index LIMIT 1
+            ''', (course_id, current_topic_id))
+        
+            current_result = cursor.fetchone()
+            if not current_result:
+                return None
             
-        current_index = current_result[0]
+            current_index = current_result[0]
         
-        # Get next topic
-        cursor.execute('''
-            SELECT DISTINCT topic_id FROM sub_exercises 
-            WHERE course_id = ? AND sub_exercise_index > ? 
-            ORDER BY sub_exercise_index LIMIT 1
-        ''', (course_id, current_index))
+            # Get next topic
+            cursor.execute('''
+                SELECT DISTINCT topic_id FROM sub_exercises 
+                WHERE course_id = ? AND sub_exercise_index > ? 
+                ORDER BY sub_exercise_index LIMIT 1
+            ''', (course_id, current_index))
         
-        next_result = cursor.fetchone()
-        conn.close()
+            next_result = cursor.fetchone()
         
         return next_result[0] if next_result else None
         
@@ -747,54 +571,52 @@ def view_submodule(course_id, submodule_id):
         return redirect(url_for('login'))
     
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Get course details
-        cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
-        course = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        if not course:
-            flash('Course not found', 'error')
-            return redirect(url_for('dashboard'))
+            # Get course details
+            cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
+            course = cursor.fetchone()
         
-        course = dict(course)
+            if not course:
+                flash('Course not found', 'error')
+                return redirect(url_for('dashboard'))
         
-        # Get submodule details
-        cursor.execute('SELECT * FROM submodules WHERE id = ?', (submodule_id,))
-        submodule = cursor.fetchone()
+            course = dict(course)
         
-        if not submodule:
-            flash('Submodule not found', 'error')
-            return redirect(url_for('course_modules', course_id=course_id))
+            # Get submodule details
+            cursor.execute('SELECT * FROM submodules WHERE id = ?', (submodule_id,))
+            submodule = cursor.fetchone()
         
-        submodule = dict(submodule)
+            if not submodule:
+                flash('Submodule not found', 'error')
+                return redirect(url_for('course_modules', course_id=course_id))
         
-        # Get module details
-        cursor.execute('SELECT * FROM modules WHERE id = ?', (submodule['module_id'],))
-        module = cursor.fetchone()
+            submodule = dict(submodule)
         
-        if module:
-            module = dict(module)
-        else:
-            module = {'title': 'Unknown Module'}
+            # Get module details
+            cursor.execute('SELECT * FROM modules WHERE id = ?', (submodule['module_id'],))
+            module = cursor.fetchone()
         
-        # Get navigation (previous and next submodules)
-        cursor.execute('''
-            SELECT id, title FROM submodules 
-            WHERE module_id = ? AND submodule_order < ?
-            ORDER BY submodule_order DESC LIMIT 1
-        ''', (submodule['module_id'], submodule['submodule_order']))
-        prev_submodule = cursor.fetchone()
+            if module:
+                module = dict(module)
+            else:
+                module = {'title': 'Unknown Module'}
         
-        cursor.execute('''
-            SELECT id, title FROM submodules 
-            WHERE module_id = ? AND submodule_order > ?
-            ORDER BY submodule_order ASC LIMIT 1
-        ''', (submodule['module_id'], submodule['submodule_order']))
-        next_submodule = cursor.fetchone()
+            # Get navigation (previous and next submodules)
+            cursor.execute('''
+                SELECT id, title FROM submodules 
+                WHERE module_id = ? AND submodule_order < ?
+                ORDER BY submodule_order DESC LIMIT 1
+            ''', (submodule['module_id'], submodule['submodule_order']))
+            prev_submodule = cursor.fetchone()
         
-        conn.close()
+            cursor.execute('''
+                SELECT id, title FROM submodules 
+                WHERE module_id = ? AND submodule_order > ?
+                ORDER BY submodule_order ASC LIMIT 1
+            ''', (submodule['module_id'], submodule['submodule_order']))
+            next_submodule = cursor.fetchone()
         
         return render_template('submodule_content.html',
                              course=course,
@@ -804,7 +626,7 @@ def view_submodule(course_id, submodule_id):
                              next_submodule=dict(next_submodule) if next_submodule else None)
         
     except Exception as e:
-        print(f"Error in view_submodule: {str(e)}")
+        logger.error(f"Error in view_submodule: {str(e)}")
         flash('Error loading submodule', 'error')
         return redirect(url_for('course_modules', course_id=course_id))
 
@@ -813,88 +635,86 @@ def view_topic(course_id, topic_id):
     try:
         return redirect(url_for('course_modules', course_id=course_id))
     except Exception as e:
-        print(f"Error redirecting: {e}")
+        logger.error(f"Error redirecting: {e}")
         return redirect(url_for('index'))
     
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Get course details
-        cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
-        course = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        if not course:
-            # Create mock course if not found
-            course = {'id': course_id, 'title': f'Course {course_id}', 'description': 'Sample course'}
-        else:
-            course = dict(course)
+            # Get course details
+            cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
+            course = cursor.fetchone()
         
-        # Get topic details (if topics table exists)
-        try:
-            cursor.execute('SELECT * FROM topics WHERE course_id = ? AND id = ?', (course_id, topic_id))
-            topic = cursor.fetchone()
-            if topic:
-                topic = dict(topic)
+            if not course:
+                # Create mock course if not found
+                course = {'id': course_id, 'title': f'Course {course_id}', 'description': 'Sample course'}
             else:
+                course = dict(course)
+        
+            # Get topic details (if topics table exists)
+            try:
+                cursor.execute('SELECT * FROM topics WHERE course_id = ? AND id = ?', (course_id, topic_id))
+                topic = cursor.fetchone()
+                if topic:
+                    topic = dict(topic)
+                else:
+                    topic = {'id': topic_id, 'title': f'Topic {topic_id}', 'content': f'<p>Welcome to topic {topic_id}!</p>'}
+            except:
                 topic = {'id': topic_id, 'title': f'Topic {topic_id}', 'content': f'<p>Welcome to topic {topic_id}!</p>'}
-        except:
-            topic = {'id': topic_id, 'title': f'Topic {topic_id}', 'content': f'<p>Welcome to topic {topic_id}!</p>'}
         
-        # Get modules (sub-exercises) directly for the course
-        try:
-            cursor.execute('''
-                SELECT * FROM sub_exercises 
-                WHERE course_id = ? 
-                AND title LIKE 'Module%'
-                ORDER BY sub_exercise_index
-            ''', (course_id,))
-            sub_exercises = cursor.fetchall()
+            # Get modules (sub-exercises) directly for the course
+            try:
+                cursor.execute('''
+                    SELECT * FROM sub_exercises 
+                    WHERE course_id = ? 
+                    AND title LIKE 'Module%'
+                    ORDER BY sub_exercise_index
+                ''', (course_id,))
+                sub_exercises = cursor.fetchall()
             
-            # Convert to dictionaries and get progress
-            exercises_with_progress = []
-            for exercise in sub_exercises:
-                exercise_dict = dict(exercise)
+                # Convert to dictionaries and get progress
+                exercises_with_progress = []
+                for exercise in sub_exercises:
+                    exercise_dict = dict(exercise)
                 
-                # Get progress for this exercise if user is logged in
-                if user_id:
-                    cursor.execute('''
-                        SELECT status, score, completion_time 
-                        FROM sub_exercise_progress 
-                        WHERE user_id = ? AND sub_exercise_id = ?
-                    ''', (user_id, exercise['id']))
-                    progress = cursor.fetchone()
+                    # Get progress for this exercise if user is logged in
+                    if user_id:
+                        cursor.execute('''
+                            SELECT status, score, completion_time 
+                            FROM sub_exercise_progress 
+                            WHERE user_id = ? AND sub_exercise_id = ?
+                        ''', (user_id, exercise['id']))
+                        progress = cursor.fetchone()
                     
-                    if progress:
-                        exercise_dict['status'] = progress['status']
-                        exercise_dict['score'] = progress['score']
-                        exercise_dict['completed'] = progress['status'] == 'completed'
+                        if progress:
+                            exercise_dict['status'] = progress['status']
+                            exercise_dict['score'] = progress['score']
+                            exercise_dict['completed'] = progress['status'] == 'completed'
+                        else:
+                            exercise_dict['status'] = 'not_started'
+                            exercise_dict['score'] = 0
+                            exercise_dict['completed'] = False
                     else:
                         exercise_dict['status'] = 'not_started'
                         exercise_dict['score'] = 0
                         exercise_dict['completed'] = False
-                else:
-                    exercise_dict['status'] = 'not_started'
-                    exercise_dict['score'] = 0
-                    exercise_dict['completed'] = False
                 
-                exercises_with_progress.append(exercise_dict)
+                    exercises_with_progress.append(exercise_dict)
             
-            sub_exercises = exercises_with_progress
+                sub_exercises = exercises_with_progress
             
-        except Exception as e:
-            print(f"Error fetching sub-exercises: {e}")
-            # Create mock exercises if table doesn't exist
-            sub_exercises = create_mock_exercises(course_id, topic_id)
-        
-        conn.close()
+            except Exception as e:
+                logger.error(f"Error fetching sub-exercises: {e}")
+                # Create mock exercises if table doesn't exist
+                sub_exercises = create_mock_exercises(course_id, topic_id)
         
         # Get user progress for continue course functionality
         user_progress = None
         if user_id:
             user_progress = get_user_progress(user_id, course_id, topic_id)
         
-        print("Rendering template with real data")
+        hot_logger.debug("Rendering topic template with real data")
         return render_template('course_module.html', 
                              course=course, 
                              topic=topic, 
@@ -905,7 +725,7 @@ def view_topic(course_id, topic_id):
                              next_topic_id=get_next_topic_id(course_id, topic_id))
         
     except Exception as e:
-        print(f"Error in view_topic: {str(e)}")
+        logger.error(f"Error in view_topic: {str(e)}")
         import traceback
         traceback.print_exc()
         
@@ -990,33 +810,31 @@ def create_mock_exercises(course_id, topic_id):
 def get_user_progress(user_id, course_id, topic_id):
     """Get user's progress for continue course functionality"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Get overall course progress
-        cursor.execute('''
-            SELECT * FROM course_progress 
-            WHERE user_id = ? AND course_id = ? AND topic_id = ?
-        ''', (user_id, course_id, topic_id))
-        progress = cursor.fetchone()
-        
-        # Get completed exercises count
-        cursor.execute('''
-            SELECT COUNT(*) as completed_count
-            FROM sub_exercise_progress 
-            WHERE user_id = ? AND course_id = ? AND topic_id = ? AND status = 'completed'
-        ''', (user_id, course_id, topic_id))
-        completed_exercises = cursor.fetchone()
-        
-        # Get total exercises count
-        cursor.execute('''
-            SELECT COUNT(*) as total_count
-            FROM sub_exercises 
-            WHERE course_id = ? AND topic_id = ?
-        ''', (course_id, topic_id))
-        total_exercises = cursor.fetchone()
-        
-        conn.close()
+            # Get overall course progress
+            cursor.execute('''
+                SELECT * FROM course_progress 
+                WHERE user_id = ? AND course_id = ? AND topic_id = ?
+            ''', (user_id, course_id, topic_id))
+            progress = cursor.fetchone()
+        
+            # Get completed exercises count
+            cursor.execute('''
+                SELECT COUNT(*) as completed_count
+                FROM sub_exercise_progress 
+                WHERE user_id = ? AND course_id = ? AND topic_id = ? AND status = 'completed'
+            ''', (user_id, course_id, topic_id))
+            completed_exercises = cursor.fetchone()
+        
+            # Get total exercises count
+            cursor.execute('''
+                SELECT COUNT(*) as total_count
+                FROM sub_exercises 
+                WHERE course_id = ? AND topic_id = ?
+            ''', (course_id, topic_id))
+            total_exercises = cursor.fetchone()
         
         if progress:
             progress_dict = dict(progress)
@@ -1033,7 +851,7 @@ def get_user_progress(user_id, course_id, topic_id):
         }
         
     except Exception as e:
-        print(f"Error getting user progress: {e}")
+        logger.error(f"Error getting user progress: {e}")
         return {
             'status': 'not_started',
             'progress_percentage': 0,
@@ -1049,40 +867,39 @@ def continue_course(course_id):
         return redirect(url_for('login'))
     
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Find the user's last accessed topic or next incomplete topic
-        cursor.execute('''
-            SELECT topic_id, progress_percentage, status 
-            FROM course_progress 
-            WHERE user_id = ? AND course_id = ?
-            ORDER BY updated_at DESC 
-            LIMIT 1
-        ''', (user_id, course_id))
-        
-        last_progress = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        if last_progress and last_progress['status'] != 'completed':
-            # Continue from last topic
-            topic_id = last_progress['topic_id']
-        else:
-            # Find first incomplete topic or start from beginning
+            # Find the user's last accessed topic or next incomplete topic
             cursor.execute('''
-                SELECT DISTINCT topic_id 
-                FROM sub_exercises 
-                WHERE course_id = ? 
-                ORDER BY topic_id 
+                SELECT topic_id, progress_percentage, status 
+                FROM course_progress 
+                WHERE user_id = ? AND course_id = ?
+                ORDER BY updated_at DESC 
                 LIMIT 1
-            ''', (course_id,))
-            
-            first_topic = cursor.fetchone()
-            if first_topic:
-                topic_id = first_topic['topic_id']
+            ''', (user_id, course_id))
+        
+            last_progress = cursor.fetchone()
+        
+            if last_progress and last_progress['status'] != 'completed':
+                # Continue from last topic
+                topic_id = last_progress['topic_id']
             else:
-                topic_id = f"{course_id}_0_0"  # Default topic format
+                # Find first incomplete topic or start from beginning
+                cursor.execute('''
+                    SELECT DISTINCT topic_id 
+                    FROM sub_exercises 
+                    WHERE course_id = ? 
+                    ORDER BY topic_id 
+                    LIMIT 1
+                ''', (course_id,))
+            
+                first_topic = cursor.fetchone()
+                if first_topic:
+                    topic_id = first_topic['topic_id']
+                else:
+                    topic_id = f"{course_id}_0_0"  # Default topic format
         
-        conn.close()
         return redirect(url_for('view_topic', course_id=course_id, topic_id=topic_id))
         
     except Exception as e:
@@ -1105,46 +922,43 @@ def complete_exercise():
         score = data.get('score', 100)
         time_spent = data.get('time_spent', 0)
         
-        conn = get_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+        
+            # Update or insert exercise progress
+            cursor.execute('''
+                INSERT OR REPLACE INTO sub_exercise_progress 
+                (user_id, course_id, topic_id, sub_exercise_id, status, score, 
+                 completion_time, time_spent, updated_at)
+                VALUES (?, ?, ?, ?, 'completed', ?, datetime('now'), ?, datetime('now'))
+            ''', (user_id, course_id, topic_id, exercise_id, score, time_spent))
+        
+            # Update overall course progress
+            cursor.execute('''
+                SELECT COUNT(*) as completed
+                FROM sub_exercise_progress 
+                WHERE user_id = ? AND course_id = ? AND topic_id = ? AND status = 'completed'
+            ''', (user_id, course_id, topic_id))
+        
+            completed_count = cursor.fetchone()['completed']
+        
+            cursor.execute('''
+                SELECT COUNT(*) as total
+                FROM sub_exercises 
+                WHERE course_id = ? AND topic_id = ?
+            ''', (course_id, topic_id))
         
-        # Update or insert exercise progress
-        cursor.execute('''
-            INSERT OR REPLACE INTO sub_exercise_progress 
-            (user_id, course_id, topic_id, sub_exercise_id, status, score, 
-             completion_time, time_spent, updated_at)
-            VALUES (?, ?, ?, ?, 'completed', ?, datetime('now'), ?, datetime('now'))
-        ''', (user_id, course_id, topic_id, exercise_id, score, time_spent))
-        
-        # Update overall course progress
-        cursor.execute('''
-            SELECT COUNT(*) as completed
-            FROM sub_exercise_progress 
-            WHERE user_id = ? AND course_id = ? AND topic_id = ? AND status = 'completed'
-        ''', (user_id, course_id, topic_id))
-        
-        completed_count = cursor.fetchone()['completed']
-        
-        cursor.execute('''
-            SELECT COUNT(*) as total
-            FROM sub_exercises 
-            WHERE course_id = ? AND topic_id = ?
-        ''', (course_id, topic_id))
-        
-        total_count = cursor.fetchone()['total']
-        progress_percentage = (completed_count / total_count * 100) if total_count > 0 else 100
-        
-        # Update course progress
-        cursor.execute('''
-            INSERT OR REPLACE INTO course_progress 
-            (user_id, course_id, topic_id, status, progress_percentage, updated_at)
-            VALUES (?, ?, ?, ?, ?, datetime('now'))
-        ''', (user_id, course_id, topic_id, 
-              'completed' if progress_percentage >= 100 else 'in_progress', 
-              progress_percentage))
-        
-        conn.commit()
-        conn.close()
+            total_count = cursor.fetchone()['total']
+            progress_percentage = (completed_count / total_count * 100) if total_count > 0 else 100
+        
+            # Update course progress
+            cursor.execute('''
+                INSERT OR REPLACE INTO course_progress 
+                (user_id, course_id, topic_id, status, progress_percentage, updated_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now'))
+            ''', (user_id, course_id, topic_id, 
+                  'completed' if progress_percentage >= 100 else 'in_progress', 
+                  progress_percentage))
         
         return jsonify({
             'success': True,
@@ -1161,56 +975,21 @@ def complete_exercise():
 @app.route('/api/course/<int:course_id>/structure')
 def get_course_structure(course_id):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Get course details
-        cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
-        course = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        if not course:
-            return jsonify({'success': False, 'error': 'Course not found'}), 404
-        
-        # Get all topics (modules) for this course
-        cursor.execute('''
-            SELECT DISTINCT topic_id, 
-                   COUNT(*) as exercise_count,
-                   MIN(sub_exercise_index) as first_exercise
-            FROM sub_exercises 
-            WHERE course_id = ? 
-            GROUP BY topic_id 
-            ORDER BY topic_id
-        ''', (course_id,))
+            # Get course details
+            cursor.execute('SELECT * FROM courses WHERE id = ?', (course_id,))
+            course = cursor.fetchone()
         
-        topics = cursor.fetchall()
+            if not course:
+                return jsonify({'success': False, 'error': 'Course not found'}), 404
         
         course_structure = {
             'course': dict(course),
-            'modules': []
-        };
-        
-        for topic in topics:
-            # Get exercises for this topic
-            cursor.execute('''
-                SELECT id, title, description, exercise_type, difficulty, 
-                       estimated_time, sub_exercise_index
-                FROM sub_exercises 
-                WHERE course_id = ? AND topic_id = ?
-                ORDER BY sub_exercise_index
-            ''', (course_id, topic['topic_id']))
-            
-            exercises = cursor.fetchall()
-            
-            module_data = {
-                'topic_id': topic['topic_id'],
-                'title': f"Module {topic['topic_id']}",
-                'exercise_count': topic['exercise_count'],
-                'exercises': [dict(exercise) for exercise in exercises]
-            }
-            
-            course_structure['modules'].append(module_data)
+            'modules': load_course_structure(course_id)
+        }
         
-        conn.close()
         return jsonify({'success': True, 'structure': course_structure})
         
     except Exception as e:
@@ -1251,20 +1030,19 @@ def results():
     
     # Handle GET request - show historical results
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Get user's quiz results
-        cursor.execute('''
-            SELECT quiz_title, score, total, language, difficulty, submitted_at
-            FROM quiz_results 
-            WHERE user_id = ? 
-            ORDER BY submitted_at DESC 
-            LIMIT 20
-        ''', (user_id,))
+            # Get user's quiz results
+            cursor.execute('''
+                SELECT quiz_title, score, total, language, difficulty, submitted_at
+                FROM quiz_results 
+                WHERE user_id = ? 
+                ORDER BY submitted_at DESC 
+                LIMIT 20
+            ''', (user_id,))
         
-        results = cursor.fetchall()
-        conn.close()
+            results = cursor.fetchall()
         
         return render_template('results.html', results=[dict(r) for r in results])
         
@@ -1277,59 +1055,28 @@ def quiz_page():
     if 'user_id' not in session:
         return redirect(url_for('login'))
         
-    import glob, json, os
-    courses = []
-    
-    # List all quiz JSON files
-    quiz_dir = os.path.join('data', 'quiz_questions', '*.json')
-    for file in glob.glob(quiz_dir):
-        try:
-            print(f"Loading quiz file: {file}")
-            with open(file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content:
-                    print(f"Warning: Empty file {file}")
-                    continue
-                    
-                data = json.loads(content)
-                filename = os.path.basename(file).replace('.json', '')
-                
-                questions = data.get('questions', [])
-                levels = sorted(set(q.get('level', 'unknown') for q in questions if 'level' in q))
-                
-                courses.append({
-                    'title': data.get('course_title', filename),
-                    'filename': filename,
-                    'levels': levels,
-                    'question_count': len(questions)
-                })
-                print(f"Successfully loaded: {data.get('course_title', filename)} with {len(questions)} questions")
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error in {file}: {e}")
-            continue
-        except Exception as e:
-            print(f"Error loading course from {file}: {e}")
-            continue
-    
+    courses = [
+        {
+            'title': quiz_course['course_title'],
+            'filename': quiz_course['slug'],
+            'levels': quiz_course['levels'],
+            'question_count': quiz_course['total_questions']
+        }
+        for quiz_course in quiz_bank.courses()
+    ]
+
     selected_course = request.args.get('course')
     selected_level = request.args.get('level')
     questions = []
-    
+
     if selected_course and selected_level:
-        file_path = os.path.join('data', 'quiz_questions', f'{selected_course}.json')
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                all_questions = data.get('questions', [])
-                level_questions = [q for q in all_questions if q.get('level') == selected_level]
-                questions = level_questions[:20]  # Limit to 20 questions
-                print(f"Loaded {len(questions)} questions for {selected_course} - {selected_level}")
-        except Exception as e:
-            print(f"Error loading questions from {file_path}: {e}")
-            questions = []
-    
-    print(f"Total courses loaded: {len(courses)}")
+        quiz_course = quiz_bank.get_course_by_slug(selected_course)
+        if quiz_course:
+            questions = quiz_course['by_level'].get(selected_level, [])[:20]  # Limit to 20 questions
+            hot_logger.debug(f"Quiz page: {len(questions)} {selected_level} questions for {selected_course}")
+        else:
+            logger.warning(f"Quiz course {selected_course} not found")
+
     return render_template('quiz_page.html', 
                          courses=courses, 
                          selected_course=selected_course, 
@@ -1346,41 +1093,22 @@ def emotion_tracker():
 
 @app.route('/quiz/questions/<course_id>/<level>')
 def get_quiz_questions(course_id, level):
-    import os, json
     try:
-        # Find the JSON file for this course
-        filename = None
-        quiz_dir = 'data/quiz_questions'
-        
-        for file in os.listdir(quiz_dir):
-            if file.endswith('.json'):
-                try:
-                    with open(os.path.join(quiz_dir, file), 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if str(data.get('course_id')) == str(course_id):
-                            filename = file
-                            break
-                except Exception as e:
-                    logger.error(f"Error reading file {file}: {e}")
-                    continue
-        
-        if not filename:
+        quiz_course = quiz_bank.get_course(course_id)
+        if not quiz_course:
             return jsonify({'success': False, 'error': 'Course not found', 'questions': []}), 404
-        
-        # Load and filter questions
-        with open(os.path.join(quiz_dir, filename), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            questions = [q for q in data.get('questions', []) if q.get('level') == level]
-            
-            # Ensure we get exactly 20 questions
-            if len(questions) >= 20:
-                questions = questions[:20]  # Take first 20 questions
-            elif len(questions) == 0:
-                return jsonify({'success': False, 'error': f'No questions found for {level} level', 'questions': []}), 404
-            else:
-                return jsonify({'success': False, 'error': f'Only {len(questions)} questions available for {level} level (need 20)', 'questions': []}), 404
-        
-        return jsonify({'success': True, 'questions': questions, 'course_title': data.get('course_title', 'Unknown Course')})
+
+        questions = quiz_course['by_level'].get(level, [])
+
+        # Ensure we get exactly 20 questions
+        if len(questions) >= 20:
+            questions = questions[:20]  # Take first 20 questions
+        elif len(questions) == 0:
+            return jsonify({'success': False, 'error': f'No questions found for {level} level', 'questions': []}), 404
+        else:
+            return jsonify({'success': False, 'error': f'Only {len(questions)} questions available for {level} level (need 20)', 'questions': []}), 404
+
+        return jsonify({'success': True, 'questions': questions, 'course_title': quiz_course['course_title']})
         
     except Exception as e:
         logger.error(f"Error getting quiz questions: {e}")
@@ -1390,44 +1118,20 @@ def get_quiz_questions(course_id, level):
 @app.route('/api/quiz/available-courses')
 def api_quiz_available_courses():
     try:
-        import os, json
         available_courses = []
-        
-        # Read all JSON quiz files directly
-        quiz_dir = 'data/quiz_questions'
-        if os.path.exists(quiz_dir):
-            for filename in os.listdir(quiz_dir):
-                if filename.endswith('.json'):
-                    try:
-                        with open(os.path.join(quiz_dir, filename), 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            course_id = data.get('course_id')
-                            course_title = data.get('course_title', 'Unknown Course')
-                            language = data.get('language', 'general')
-                            
-                            # Check if the course has questions for all levels
-                            questions = data.get('questions', [])
-                            basic_count = len([q for q in questions if q.get('level') == 'basic'])
-                            intermediate_count = len([q for q in questions if q.get('level') == 'intermediate'])
-                            advanced_count = len([q for q in questions if q.get('level') == 'advanced'])
-                            
-                            # Only include courses that have at least 20 questions per level
-                            if basic_count >= 20 and intermediate_count >= 20 and advanced_count >= 20:
-                                available_courses.append({
-                                    'id': course_id,
-                                    'title': course_title,
-                                    'language': language,
-                                    'filename': filename,
-                                    'question_counts': {
-                                        'basic': basic_count,
-                                        'intermediate': intermediate_count,
-                                        'advanced': advanced_count
-                                    }
-                                })
-                    except Exception as e:
-                        logger.error(f"Error reading quiz file {filename}: {e}")
-                        continue
-        
+
+        for quiz_course in quiz_bank.courses():
+            # Only include courses that have at least 20 questions per level
+            question_counts = {level: quiz_course['level_counts'].get(level, 0) for level in QUIZ_LEVELS}
+            if all(count >= 20 for count in question_counts.values()):
+                available_courses.append({
+                    'id': quiz_course['course_id'],
+                    'title': quiz_course['course_title'],
+                    'language': quiz_course['language'] or 'general',
+                    'filename': quiz_course['filename'],
+                    'question_counts': question_counts
+                })
+
         return jsonify({
             'success': True,
             'courses': available_courses
@@ -1455,41 +1159,17 @@ def api_quiz_course_questions():
                 'questions': []
             }), 400
         
-        # Try to load quiz questions from JSON file
-        quiz_dir = 'data/quiz_questions'
-        questions = []
-        
-        if os.path.exists(quiz_dir):
-            for file in os.listdir(quiz_dir):
-                if file.endswith('.json'):
-                    quiz_path = os.path.join(quiz_dir, file)
-                    try:
-                        with open(quiz_path, 'r', encoding='utf-8') as f:
-                            quiz_data = json.load(f)
-                            
-                        file_course_id = str(quiz_data.get('course_id', ''))
-                        
-                        if file_course_id == str(course_id):
-                            quiz_questions = quiz_data.get('questions', [])
-                            
-                            # Filter by difficulty if specified and not 'all'
-                            if difficulty != 'all':
-                                quiz_questions = [q for q in quiz_questions if q.get('level') == difficulty]
-                            
-                            # Filter by topic if specified
-                            if topic_id:
-                                quiz_questions = [q for q in quiz_questions if q.get('topic_id') == topic_id]
-                            
-                            questions.extend(quiz_questions)
-                            
-                    except Exception as e:
-                        logger.error(f"Error reading quiz file {file}: {e}")
-                        continue
-        
+        # Look up quiz questions in the quiz bank index ('all' means any level).
+        # Copy the indexed list so shuffling below never reorders the cache.
+        questions = list(quiz_bank.questions(
+            course_id,
+            level=None if difficulty == 'all' else difficulty,
+            topic_id=topic_id or None
+        ))
+
         # If we found questions, return them (limit to 15 for manageable quiz)
         if questions:
             # Shuffle questions for variety
-            import random
             random.shuffle(questions)
             selected_questions = questions[:15]
             
@@ -1682,15 +1362,13 @@ def api_quiz_submit():
         # Save results to database if user is logged in
         if user_id:
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO quiz_results 
-                    (user_id, quiz_title, score, total, language, difficulty, submitted_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (user_id, quiz_title, int(score_percentage), total_questions, language, difficulty, datetime.now().isoformat()))
-                conn.commit()
-                conn.close()
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        INSERT INTO quiz_results 
+                        (user_id, quiz_title, score, total, language, difficulty, submitted_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (user_id, quiz_title, int(score_percentage), total_questions, language, difficulty, datetime.now().isoformat()))
             except Exception as db_error:
                 logger.error(f"Database error saving quiz results: {db_error}")
 
@@ -1713,95 +1391,92 @@ def api_quiz_submit():
 @app.route('/admin/seed-course-structure')
 def seed_course_structure():
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Sample course structure: Course → Modules (Topics) → Exercises → Tasks
-        sample_courses = [
-            {
-                'id': 1,
-                'title': 'Python Fundamentals',
-                'description': 'Learn Python programming from basics to advanced concepts',
-                'language': 'python',
-                'difficulty': 'beginner',
-                'modules': [
-                    {
-                        'topic_id': '1_0_0',
-                        'title': 'Python Basics',
-                        'exercises': [
-                            {'title': 'Introduction to Python', 'type': 'theory', 'difficulty': 'beginner'},
-                            {'title': 'Variables and Data Types', 'type': 'example', 'difficulty': 'beginner'},
-                            {'title': 'Practice: Variables', 'type': 'practice', 'difficulty': 'beginner'},
-                            {'title': 'Basic Operations Quiz', 'type': 'quiz', 'difficulty': 'beginner'},
-                            {'title': 'Calculator Project', 'type': 'project', 'difficulty': 'intermediate'}
-                        ]
-                    },
-                    {
-                        'topic_id': '1_1_0',
-                        'title': 'Control Structures',
-                        'exercises': [
-                            {'title': 'If Statements', 'type': 'theory', 'difficulty': 'beginner'},
-                            {'title': 'Loops Overview', 'type': 'example', 'difficulty': 'beginner'},
-                            {'title': 'Practice: Loops', 'type': 'practice', 'difficulty': 'intermediate'},
-                            {'title': 'Control Flow Quiz', 'type': 'quiz', 'difficulty': 'intermediate'},
-                            {'title': 'Number Guessing Game', 'type': 'project', 'difficulty': 'intermediate'}
-                        ]
-                    }
-                ]
-            },
-            {
-                'id': 2,
-                'title': 'JavaScript Essentials',
-                'description': 'Master JavaScript for web development',
-                'language': 'javascript',
-                'difficulty': 'beginner',
-                'modules': [
-                    {
-                        'topic_id': '2_0_0',
-                        'title': 'JavaScript Fundamentals',
-                        'exercises': [
-                            {'title': 'Introduction to JavaScript', 'type': 'theory', 'difficulty': 'beginner'},
-                            {'title': 'Variables and Functions', 'type': 'example', 'difficulty': 'beginner'},
-                            {'title': 'Practice: Functions', 'type': 'practice', 'difficulty': 'beginner'},
-                            {'title': 'JavaScript Basics Quiz', 'type': 'quiz', 'difficulty': 'beginner'},
-                            {'title': 'Interactive Webpage', 'type': 'project', 'difficulty': 'intermediate'}
-                        ]
-                    }
-                ]
-            }
-        ]
+            # Sample course structure: Course → Modules (Topics) → Exercises → Tasks
+            sample_courses = [
+                {
+                    'id': 1,
+                    'title': 'Python Fundamentals',
+                    'description': 'Learn Python programming from basics to advanced concepts',
+                    'language': 'python',
+                    'difficulty': 'beginner',
+                    'modules': [
+                        {
+                            'topic_id': '1_0_0',
+                            'title': 'Python Basics',
+                            'exercises': [
+                                {'title': 'Introduction to Python', 'type': 'theory', 'difficulty': 'beginner'},
+                                {'title': 'Variables and Data Types', 'type': 'example', 'difficulty': 'beginner'},
+                                {'title': 'Practice: Variables', 'type': 'practice', 'difficulty': 'beginner'},
+                                {'title': 'Basic Operations Quiz', 'type': 'quiz', 'difficulty': 'beginner'},
+                                {'title': 'Calculator Project', 'type': 'project', 'difficulty': 'intermediate'}
+                            ]
+                        },
+                        {
+                            'topic_id': '1_1_0',
+                            'title': 'Control Structures',
+                            'exercises': [
+                                {'title': 'If Statements', 'type': 'theory', 'difficulty': 'beginner'},
+                                {'title': 'Loops Overview', 'type': 'example', 'difficulty': 'beginner'},
+                                {'title': 'Practice: Loops', 'type': 'practice', 'difficulty': 'intermediate'},
+                                {'title': 'Control Flow Quiz', 'type': 'quiz', 'difficulty': 'intermediate'},
+                                {'title': 'Number Guessing Game', 'type': 'project', 'difficulty': 'intermediate'}
+                            ]
+                        }
+                    ]
+                },
+                {
+                    'id': 2,
+                    'title': 'JavaScript Essentials',
+                    'description': 'Master JavaScript for web development',
+                    'language': 'javascript',
+                    'difficulty': 'beginner',
+                    'modules': [
+                        {
+                            'topic_id': '2_0_0',
+                            'title': 'JavaScript Fundamentals',
+                            'exercises': [
+                                {'title': 'Introduction to JavaScript', 'type': 'theory', 'difficulty': 'beginner'},
+                                {'title': 'Variables and Functions', 'type': 'example', 'difficulty': 'beginner'},
+                                {'title': 'Practice: Functions', 'type': 'practice', 'difficulty': 'beginner'},
+                                {'title': 'JavaScript Basics Quiz', 'type': 'quiz', 'difficulty': 'beginner'},
+                                {'title': 'Interactive Webpage', 'type': 'project', 'difficulty': 'intermediate'}
+                            ]
+                        }
+                    ]
+                }
+            ]
         
-        # Insert courses
-        for course in sample_courses:
-            cursor.execute('''
-                INSERT OR REPLACE INTO courses (id, title, description, language, difficulty)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (course['id'], course['title'], course['description'], 
-                  course['language'], course['difficulty']))
+            # Insert courses
+            for course in sample_courses:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO courses (id, title, description, language, difficulty)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (course['id'], course['title'], course['description'], 
+                      course['language'], course['difficulty']))
             
-            # Insert modules and exercises
-            for module in course['modules']:
-                for i, exercise in enumerate(module['exercises']):
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO sub_exercises 
-                        (course_id, topic_id, sub_exercise_index, title, exercise_type, 
-                         difficulty, estimated_time, description, content, instructions)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        course['id'],
-                        module['topic_id'],
-                        i + 1,
-                        exercise['title'],
-                        exercise['type'],
-                        exercise['difficulty'],
-                        15,  # estimated_time
-                        f"Learn about {exercise['title']}",
-                        f"<h3>{exercise['title']}</h3><p>Content for {exercise['title']} goes here.</p>",
-                        f"Complete the {exercise['title']} exercise."
-                    ))
-        
-        conn.commit()
-        conn.close()
+                # Insert modules and exercises
+                for module in course['modules']:
+                    for i, exercise in enumerate(module['exercises']):
+                        cursor.execute('''
+                            INSERT OR REPLACE INTO sub_exercises 
+                            (course_id, topic_id, sub_exercise_index, title, exercise_type, 
+                             difficulty, estimated_time, description, content, instructions)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', (
+                            course['id'],
+                            module['topic_id'],
+                            i + 1,
+                            exercise['title'],
+                            exercise['type'],
+                            exercise['difficulty'],
+                            15,  # estimated_time
+                            f"Learn about {exercise['title']}",
+                            f"<h3>{exercise['title']}</h3><p>Content for {exercise['title']} goes here.</p>",
+                            f"Complete the {exercise['title']} exercise."
+                        ))
         
         return jsonify({
             'success': True,
@@ -1821,47 +1496,45 @@ def get_user_progress_dashboard():
         return jsonify({'success': False, 'error': 'User not logged in'}), 401
     
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Get all courses with user progress
-        cursor.execute('''
-            SELECT c.id, c.title, c.description, c.language, c.difficulty,
-                   COUNT(DISTINCT se.id) as total_exercises,
-                   COUNT(DISTINCT sep.id) as completed_exercises,
-                   AVG(sep.score) as avg_score,
-                   MAX(cp.updated_at) as last_activity
-            FROM courses c
-            LEFT JOIN sub_exercises se ON c.id = se.course_id
-            LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id AND sep.user_id = ?
-            LEFT JOIN course_progress cp ON c.id = cp.course_id AND cp.user_id = ?
-            GROUP BY c.id, c.title, c.description, c.language, c.difficulty
-            ORDER BY last_activity DESC, c.id
-        ''', (user_id, user_id))
-        
-        courses_progress = cursor.fetchall()
-        
-        progress_data = []
-        for course in courses_progress:
-            total_ex = course['total_exercises'] or 0
-            completed_ex = course['completed_exercises'] or 0
-            progress_percentage = (completed_ex / total_ex * 100) if total_ex > 0 else 0;
+            # Get all courses with user progress
+            cursor.execute('''
+                SELECT c.id, c.title, c.description, c.language, c.difficulty,
+                       COUNT(DISTINCT se.id) as total_exercises,
+                       COUNT(DISTINCT sep.id) as completed_exercises,
+                       AVG(sep.score) as avg_score,
+                       MAX(cp.updated_at) as last_activity
+                FROM courses c
+                LEFT JOIN sub_exercises se ON c.id = se.course_id
+                LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id AND sep.user_id = ?
+                LEFT JOIN course_progress cp ON c.id = cp.course_id AND cp.user_id = ?
+                GROUP BY c.id, c.title, c.description, c.language, c.difficulty
+                ORDER BY last_activity DESC, c.id
+            ''', (user_id, user_id))
+        
+            courses_progress = cursor.fetchall()
+        
+            progress_data = []
+            for course in courses_progress:
+                total_ex = course['total_exercises'] or 0
+                completed_ex = course['completed_exercises'] or 0
+                progress_percentage = (completed_ex / total_ex * 100) if total_ex > 0 else 0;
             
-            progress_data.append({
-                'course_id': course['id'],
-                'title': course['title'],
-                'description': course['description'],
-                'language': course['language'],
-                'difficulty': course['difficulty'],
-                'total_exercises': total_ex,
-                'completed_exercises': completed_ex,
-                'progress_percentage': round(progress_percentage, 1),
-                'avg_score': round(course['avg_score'] or 0, 1),
-                'last_activity': course['last_activity'],
-                'can_continue': completed_ex > 0 and progress_percentage < 100
-            })
-        
-        conn.close()
+                progress_data.append({
+                    'course_id': course['id'],
+                    'title': course['title'],
+                    'description': course['description'],
+                    'language': course['language'],
+                    'difficulty': course['difficulty'],
+                    'total_exercises': total_ex,
+                    'completed_exercises': completed_ex,
+                    'progress_percentage': round(progress_percentage, 1),
+                    'avg_score': round(course['avg_score'] or 0, 1),
+                    'last_activity': course['last_activity'],
+                    'can_continue': completed_ex > 0 and progress_percentage < 100
+                })
         
         return jsonify({
             'success': True,
@@ -1879,31 +1552,43 @@ def get_next_topic(course_id):
     user_id = session.get('user_id')
     
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        if user_id:
-            # Find next incomplete topic
-            cursor.execute('''
-                SELECT DISTINCT se.topic_id,
-                       COUNT(se.id) as total_exercises,
-                       COUNT(sep.id) as completed_exercises
-                FROM sub_exercises se
-                LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id 
-                    AND sep.user_id = ? AND sep.status = 'completed'
-                WHERE se.course_id = ?
-                GROUP BY se.topic_id
-                HAVING completed_exercises < total_exercises
-                ORDER BY se.topic_id
-                LIMIT 1
-            ''', (user_id, course_id))
+            if user_id:
+                # Find next incomplete topic
+                cursor.execute('''
+                    SELECT DISTINCT se.topic_id,
+                           COUNT(se.id) as total_exercises,
+                           COUNT(sep.id) as completed_exercises
+                    FROM sub_exercises se
+                    LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id 
+                        AND sep.user_id = ? AND sep.status = 'completed'
+                    WHERE se.course_id = ?
+                    GROUP BY se.topic_id
+                    HAVING completed_exercises < total_exercises
+                    ORDER BY se.topic_id
+                    LIMIT 1
+                ''', (user_id, course_id))
             
-            next_topic = cursor.fetchone()
+                next_topic = cursor.fetchone()
             
-            if next_topic:
-                topic_id = next_topic['topic_id']
+                if next_topic:
+                    topic_id = next_topic['topic_id']
+                else:
+                    # All topics completed or start from beginning
+                    cursor.execute('''
+                        SELECT DISTINCT topic_id 
+                        FROM sub_exercises 
+                        WHERE course_id = ? 
+                        ORDER BY topic_id 
+                        LIMIT 1
+                    ''', (course_id,))
+                
+                    first_topic = cursor.fetchone()
+                    topic_id = first_topic['topic_id'] if first_topic else f"{course_id}_0_0"
             else:
-                # All topics completed or start from beginning
+                # No user, start from first topic
                 cursor.execute('''
                     SELECT DISTINCT topic_id 
                     FROM sub_exercises 
@@ -1911,23 +1596,9 @@ def get_next_topic(course_id):
                     ORDER BY topic_id 
                     LIMIT 1
                 ''', (course_id,))
-                
+            
                 first_topic = cursor.fetchone()
                 topic_id = first_topic['topic_id'] if first_topic else f"{course_id}_0_0"
-        else:
-            # No user, start from first topic
-            cursor.execute('''
-                SELECT DISTINCT topic_id 
-                FROM sub_exercises 
-                WHERE course_id = ? 
-                ORDER BY topic_id 
-                LIMIT 1
-            ''', (course_id,))
-            
-            first_topic = cursor.fetchone()
-            topic_id = first_topic['topic_id'] if first_topic else f"{course_id}_0_0"
-        
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -1946,12 +1617,9 @@ def get_next_topic(course_id):
 # Enhanced emotion detection route with real computer vision
 @app.route('/detect_emotion', methods=['POST'])
 def detect_emotion():
-    print('DEBUG: /detect_emotion called')
     data = request.get_json()
     if not data or 'frame' not in data:
         return jsonify({'error': 'No frame data provided'}), 400
-    frame_data = data['frame']
-    print(f'DEBUG: Received frame data, length={len(frame_data)}')
     detection_mode = data.get('detection_mode', 'analysis')
     # Emotion/face recognition code removed
     return jsonify({'success': False, 'error': 'Emotion detection not available'})
@@ -2007,10 +1675,10 @@ def get_user_courses():
 
     user_id = session['user_id']
     try:
-        connection = get_connection()
-        cursor = connection.cursor()
-        cursor.execute("SELECT course_id FROM user_courses WHERE user_id = ?", (user_id,))
-        user_courses = [row['course_id'] for row in cursor.fetchall()]
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT course_id FROM user_courses WHERE user_id = ?", (user_id,))
+            user_courses = [row['course_id'] for row in cursor.fetchall()]
         return jsonify({"success": True, "user_courses": user_courses})
     except Exception as e:
         logger.error(f"Error fetching user courses: {e}")
@@ -2029,40 +1697,39 @@ def start_course():
         return jsonify({"success": False, "error": "Course ID is required"})
 
     try:
-        connection = get_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            "INSERT OR IGNORE INTO user_courses (user_id, course_id) VALUES (?, ?)", (user_id, course_id)
-        )
-        connection.commit()
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                "INSERT OR IGNORE INTO user_courses (user_id, course_id) VALUES (?, ?)", (user_id, course_id)
+            )
         return jsonify({"success": True, "message": "Course started successfully"})
     except Exception as e:
         logger.error(f"Error starting course: {e}")
         return jsonify({"success": False, "error": str(e)})
 
 @app.route('/api/emotion', methods=['POST'])
-def save_emotion_data():
-    """Save emotion data from frontend during learning."""
+def save_emotion_data(data=None):
+    """Save emotion data from frontend during learning.
+    
+    ``data`` is the body already parsed by api_emotion (JSON, form fields
+    or query string); called without it, the JSON or form body is read.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'User not logged in'})
     user_id = session['user_id']
-    data = request.json
+    if data is None:
+        data = request.get_json(silent=True) or request.form
     emotion = data.get('emotion')
     course_id = data.get('course_id')
     topic_id = data.get('topic_id')
-    timestamp = datetime.now().isoformat()
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO emotions (user_id, emotion, timestamp, course_id, topic_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, emotion, timestamp, course_id, topic_id))
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    if not emotion:
+        return jsonify({'success': False, 'error': 'Emotion is required'}), 400
+    # Returns once queued; the ingest writer batches the INSERT
+    if not emotion_ingest.submit(user_id, emotion, course_id=course_id, topic_id=topic_id):
+        response = jsonify({'success': False, 'error': 'Emotion ingestion is busy, retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'success': True, 'queued': True})
 
 @app.route('/api/module_status', methods=['POST'])
 def update_module_status():
@@ -2075,15 +1742,13 @@ def update_module_status():
     status = data.get('status', 'started')
     score = data.get('score', 0)
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO module_progress (user_id, module_id, status, score)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id, module_id) DO UPDATE SET status=excluded.status, score=excluded.score
-        ''', (user_id, module_id, status, score))
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO module_progress (user_id, module_id, status, score)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, module_id) DO UPDATE SET status=excluded.status, score=excluded.score
+            ''', (user_id, module_id, status, score))
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -2131,23 +1796,9 @@ def get_career_recommendations():
         with open(career_file, 'r', encoding='utf-8') as f:
             career_data = json.load(f)
         
-        # Get list of available courses from quiz files
-        available_languages = set()
-        quiz_dir = 'data/quiz_questions'
-        
-        if os.path.exists(quiz_dir):
-            for filename in os.listdir(quiz_dir):
-                if filename.endswith('.json'):
-                    try:
-                        with open(os.path.join(quiz_dir, filename), 'r', encoding='utf-8') as f:
-                            quiz_data = json.load(f)
-                            language = quiz_data.get('language', '').lower()
-                            if language:
-                                available_languages.add(language)
-                    except Exception as e:
-                        logger.error(f"Error reading quiz file {filename}: {e}")
-                        continue
-        
+        # Get list of available languages from the quiz bank
+        available_languages = quiz_bank.languages()
+
         # Process careers to only show tech stack items that are available
         processed_careers = []
         
@@ -2210,31 +1861,17 @@ def get_career_detail(career_id):
         if not selected_career:
             return jsonify({'success': False, 'error': 'Career not found'}), 404
         
-        # Get available languages from quiz files
-        available_languages = set()
-        quiz_dir = 'data/quiz_questions'
-        course_info = {}
-        
-        if os.path.exists(quiz_dir):
-            for filename in os.listdir(quiz_dir):
-                if filename.endswith('.json'):
-                    try:
-                        with open(os.path.join(quiz_dir, filename), 'r', encoding='utf-8') as f:
-                            quiz_data = json.load(f)
-                            language = quiz_data.get('language', '').lower()
-                            course_id = quiz_data.get('course_id')
-                            course_title = quiz_data.get('course_title')
-                            
-                            if language:
-                                available_languages.add(language)
-                                course_info[course_id] = {
-                                    'title': course_title,
-                                    'language': language
-                                }
-                    except Exception as e:
-                        logger.error(f"Error reading quiz file {filename}: {e}")
-                        continue
-        
+        # Get available languages from the quiz bank
+        available_languages = quiz_bank.languages()
+        course_info = {
+            quiz_course['course_id']: {
+                'title': quiz_course['course_title'],
+                'language': quiz_course['language'].lower()
+            }
+            for quiz_course in quiz_bank.courses()
+            if quiz_course['language']
+        }
+
         # Build detailed skill information
         skill_mapping = career_data.get('skill_mapping', {})
         detailed_skills = []
@@ -2262,22 +1899,20 @@ def get_career_detail(career_id):
         user_progress = {}
         if 'user_id' in session:
             user_id = session['user_id']
-            conn = get_connection()
-            cursor = conn.cursor()
+            with db_connection() as conn:
+                cursor = conn.cursor()
             
-            for skill in detailed_skills:
-                course_id = skill['course_id']
-                cursor.execute('''
-                    SELECT AVG(progress_percentage) as avg_progress
-                    FROM course_progress 
-                    WHERE user_id = ? AND course_id = ?
-                ''', (user_id, course_id))
+                for skill in detailed_skills:
+                    course_id = skill['course_id']
+                    cursor.execute('''
+                        SELECT AVG(progress_percentage) as avg_progress
+                        FROM course_progress 
+                        WHERE user_id = ? AND course_id = ?
+                    ''', (user_id, course_id))
                 
-                progress_result = cursor.fetchone()
-                user_progress[course_id] = progress_result['avg_progress'] if progress_result else 0
+                    progress_result = cursor.fetchone()
+                    user_progress[course_id] = progress_result['avg_progress'] if progress_result else 0
             
-            conn.close()
-        
         return jsonify({
             'success': True,
             'career': {
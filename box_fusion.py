@@ -0,0 +1,81 @@
+import numpy as np
+
+# Score given to a Haar cascade hit, which has no confidence of its own
+HAAR_SCORE = 0.8
+
+# Boxes from either detector overlapping more than this are the same face
+FUSION_IOU_THRESHOLD = 0.3
+
+
+def as_boxes(boxes):
+    """(N, 4) float array of x, y, width, height boxes"""
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def pairwise_iou(a, b):
+    """IoU of every box in ``a`` (N, 4) against every box in ``b`` (M, 4) as an (N, M) array"""
+    a = as_boxes(a)
+    b = as_boxes(b)
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = (a[:, 2:3] * a[:, 3:4]) + (b[:, 2] * b[:, 3]) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def weighted_nms(boxes, scores, iou_threshold=FUSION_IOU_THRESHOLD):
+    """Cluster overlapping boxes and average each cluster by score.
+
+    Unlike plain NMS, which keeps the top box and throws the rest away,
+    every box in a cluster contributes to the fused coordinates in
+    proportion to its score. Returns ``(fused boxes, members)`` where
+    ``members[i]`` holds the input indices merged into fused box ``i``;
+    clusters come out in order of their best score.
+    """
+    boxes = as_boxes(boxes)
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(boxes) == 0:
+        return boxes, []
+
+    iou = pairwise_iou(boxes, boxes)
+    remaining = np.argsort(-scores, kind='stable')
+    fused, members = [], []
+    while remaining.size:
+        cluster = remaining[iou[remaining[0], remaining] >= iou_threshold]
+        weights = scores[cluster]
+        fused.append(weights @ boxes[cluster] / weights.sum())
+        members.append(cluster)
+        remaining = np.setdiff1d(remaining, cluster, assume_unique=True)
+        # setdiff1d sorts its output; restore score order
+        remaining = remaining[np.argsort(-scores[remaining], kind='stable')]
+    return np.array(fused), members
+
+
+def fuse_detections(haar_boxes, mediapipe_boxes, mediapipe_scores, iou_threshold=FUSION_IOU_THRESHOLD):
+    """Merge Haar and MediaPipe face boxes into one list of faces.
+
+    Returns ``[(box, confidence, sources)]`` with integer x, y, w, h boxes.
+    The confidence treats each detector as an independent vote
+    (``1 - prod(1 - p)`` over the best score from each source), so a face
+    both detectors agree on scores higher than either alone.
+    """
+    haar_boxes = as_boxes(haar_boxes)
+    mediapipe_boxes = as_boxes(mediapipe_boxes)
+    boxes = np.vstack([haar_boxes, mediapipe_boxes])
+    scores = np.concatenate([np.full(len(haar_boxes), HAAR_SCORE),
+                             np.asarray(mediapipe_scores, dtype=np.float64)])
+    sources = np.array(['haar'] * len(haar_boxes) + ['mediapipe'] * len(mediapipe_boxes))
+
+    fused, members = weighted_nms(boxes, scores, iou_threshold)
+    faces = []
+    for box, cluster in zip(fused, members):
+        best = {str(source): scores[cluster][sources[cluster] == source].max()
+                for source in np.unique(sources[cluster])}
+        confidence = 1.0 - np.prod([1.0 - p for p in best.values()])
+        faces.append((tuple(int(round(v)) for v in box), round(float(confidence), 2), tuple(sorted(best))))
+    return faces
@@ -1,190 +1,432 @@
+import logging
 import os
 import sqlite3
+import threading
+import time
 import uuid
 import json
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'app.db')
 
+# Seconds a writer waits on SQLite's lock before raising "database is locked"
+BUSY_TIMEOUT = 30
+
+# Applied to every connection. WAL lets readers run alongside the single
+# writer and, with synchronous=NORMAL, commits skip the per-transaction fsync
+# of the rollback journal.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',  # 256 MB
+    'PRAGMA cache_size=-20000',  # ~20 MB page cache
+    'PRAGMA temp_store=MEMORY',
+)
+
+_local = threading.local()
+
+# Callables run as observer(sql, seconds) after every statement; see add_query_observer()
+_query_observers = []
+
+
+def add_query_observer(observer):
+    """Call ``observer(sql, seconds)`` after each statement on any connection.
+
+    The time covers executing the statement up to its first row; rows
+    fetched afterwards are not included.
+    """
+    _query_observers.append(observer)
+
+
+class _ObservedCursor(sqlite3.Cursor):
+    def _observe(self, method, sql, *args):
+        if not _query_observers:
+            return method(sql, *args)
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            for observer in _query_observers:
+                observer(sql, elapsed)
+
+    def execute(self, sql, parameters=()):
+        return self._observe(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._observe(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._observe(super().executescript, sql_script)
+
+
+class _ObservedConnection(sqlite3.Connection):
+    """Connection whose statements are reported to the query observers"""
+
+    def cursor(self, factory=_ObservedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts create a plain cursor, so route them through ours
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
 
 def get_connection():
-    connection = sqlite3.connect(DB_PATH)
+    """Open a new standalone connection (scripts and one-off tools)"""
+    connection = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, factory=_ObservedConnection)
     connection.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        connection.execute(pragma)
     return connection
 
 
-def init_db():
-    connection = get_connection()
-    cursor = connection.cursor()
-    
-    # Drop existing users table if it exists
-    cursor.execute('DROP TABLE IF EXISTS users')
-    
-    cursor.executescript(
-        '''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            email TEXT,
-            bio TEXT,
-            learning_goals TEXT,
-            avatar_url TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            is_guest INTEGER DEFAULT 0
-        );
+def _thread_connection():
+    """Return the calling thread's pooled connection, opening it on first use"""
+    connection = getattr(_local, 'connection', None)
+    # A forked worker must not reuse the parent's connection
+    if connection is None or _local.pid != os.getpid():
+        connection = get_connection()
+        _local.connection = connection
+        _local.pid = os.getpid()
+        _local.depth = 0
+    return connection
 
-        CREATE TABLE IF NOT EXISTS programming_languages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT,
-            icon_class TEXT
-        );
 
-        CREATE TABLE IF NOT EXISTS assessment_questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            language_id INTEGER NOT NULL,
-            question_text TEXT NOT NULL,
-            options TEXT NOT NULL,
-            correct_answer INTEGER NOT NULL,
-            difficulty_level TEXT NOT NULL,
-            category TEXT,
-            explanation TEXT,
-            FOREIGN KEY(language_id) REFERENCES programming_languages(id)
-        );
+@contextmanager
+def db_connection():
+    """Borrow this thread's pooled connection.
+
+    Commits when the outermost block exits cleanly and rolls back if it
+    raises. Nested blocks share the connection and the outer transaction.
+    """
+    connection = _thread_connection()
+    _local.depth += 1
+    try:
+        yield connection
+    except BaseException:
+        _local.depth -= 1
+        if _local.depth == 0:
+            connection.rollback()
+        raise
+    _local.depth -= 1
+    if _local.depth == 0:
+        connection.commit()
 
-        CREATE TABLE IF NOT EXISTS courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            language TEXT,
-            difficulty TEXT,
-            level TEXT,
-            prerequisites TEXT
-        );
 
-        CREATE TABLE IF NOT EXISTS progress (
+def close_thread_connection():
+    """Close the calling thread's pooled connection, if any"""
+    connection = getattr(_local, 'connection', None)
+    if connection is not None:
+        _local.connection = None
+        connection.close()
+
+
+# Schema changes applied on top of the base tables created by init_db().
+# PRAGMA user_version records how many have run; append new entries and
+# never edit or reorder ones that have shipped.
+MIGRATIONS = [
+    (
+        'indexes for hot query paths',
+        '''
+        -- get_recent_emotions / get_student_data: WHERE user_id = ? ORDER BY id DESC
+        CREATE INDEX IF NOT EXISTS idx_emotions_user ON emotions(user_id);
+        -- get_emotion_analytics: covers the user's rows without touching the table
+        CREATE INDEX IF NOT EXISTS idx_emotions_user_time
+            ON emotions(user_id, timestamp, emotion, course_id, topic_id);
+        -- progress lookups by user and sub-exercise (view_topic, LEFT JOINs)
+        CREATE INDEX IF NOT EXISTS idx_sub_exercise_progress_user_sub
+            ON sub_exercise_progress(user_id, sub_exercise_id, status, score);
+        -- completed-exercise counts per user, course and topic
+        CREATE INDEX IF NOT EXISTS idx_sub_exercise_progress_user_topic_status
+            ON sub_exercise_progress(user_id, course_id, topic_id, status);
+        -- results page and get_student_data
+        CREATE INDEX IF NOT EXISTS idx_quiz_results_user_submitted
+            ON quiz_results(user_id, submitted_at);
+        CREATE INDEX IF NOT EXISTS idx_quiz_results_user_score ON quiz_results(user_id, score);
+        CREATE INDEX IF NOT EXISTS idx_progress_user ON progress(user_id);
+        CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+        '''
+    ),
+    (
+        'epoch timestamps for sargable emotion time windows',
+        '''
+        -- UTC seconds since the epoch, so windows are an index range scan
+        -- instead of datetime(timestamp) evaluated on every row.
+        -- Rows written before this migration came from datetime.now(), i.e.
+        -- naive server local time; the 'utc' modifier converts them using
+        -- the timezone of the process running the migration, which is
+        -- assumed to be the one that wrote them.
+        ALTER TABLE emotions ADD COLUMN timestamp_epoch INTEGER;
+        UPDATE emotions SET timestamp_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER);
+        CREATE INDEX IF NOT EXISTS idx_emotions_user_epoch
+            ON emotions(user_id, timestamp_epoch, emotion, course_id, topic_id);
+        DROP INDEX IF EXISTS idx_emotions_user_time;
+        '''
+    ),
+    (
+        'per-user emotion rollups',
+        '''
+        -- Per-emotion sample counts in 300 s buckets (EMOTION_BUCKET_SECONDS).
+        -- Samples without a course or topic are keyed under 0 and ''.
+        CREATE TABLE IF NOT EXISTS emotion_rollups (
+            user_id INTEGER NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            course_id INTEGER NOT NULL DEFAULT 0,
+            topic_id TEXT NOT NULL DEFAULT '',
+            emotion TEXT NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, bucket_start, course_id, topic_id, emotion)
+        ) WITHOUT ROWID;
+        INSERT INTO emotion_rollups (user_id, bucket_start, course_id, topic_id, emotion, sample_count)
+            SELECT user_id, (timestamp_epoch / 300) * 300, COALESCE(course_id, 0), COALESCE(topic_id, ''),
+                   emotion, COUNT(*)
+            FROM emotions
+            WHERE timestamp_epoch IS NOT NULL
+            GROUP BY 1, 2, 3, 4, 5;
+        '''
+    ),
+    (
+        'course_progress table',
+        '''
+        -- Per-topic progress written by /api/exercise/complete and read by the
+        -- dashboard, continue-course and career pages
+        CREATE TABLE IF NOT EXISTS course_progress (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
             course_id INTEGER NOT NULL,
             topic_id TEXT,
-            status TEXT NOT NULL,
-            start_time TEXT,
-            completion_time TEXT,
-            time_spent INTEGER DEFAULT 0,
-            concentration_score REAL DEFAULT 0,
+            status TEXT,
             progress_percentage REAL DEFAULT 0,
-            module_index INTEGER,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(course_id) REFERENCES courses(id)
+            UNIQUE(user_id, course_id, topic_id)
         );
-
-        CREATE TABLE IF NOT EXISTS sub_exercises (
+        -- Covers the dashboard's grouped summary
+        CREATE INDEX IF NOT EXISTS idx_course_progress_user_course
+            ON course_progress(user_id, course_id, progress_percentage);
+        '''
+    ),
+    (
+        'modules and submodules tables',
+        '''
+        -- Course outline read by course_modules and view_submodule; content
+        -- is filled in by create_module_content.py and update_content.py
+        CREATE TABLE IF NOT EXISTS modules (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             course_id INTEGER NOT NULL,
-            topic_id TEXT NOT NULL,
-            sub_exercise_index INTEGER NOT NULL,
             title TEXT NOT NULL,
             description TEXT,
-            content TEXT,
-            exercise_type TEXT NOT NULL, -- 'theory', 'example', 'practice', 'quiz', 'project'
-            difficulty TEXT DEFAULT 'beginner',
-            estimated_time INTEGER DEFAULT 10, -- minutes
-            prerequisites TEXT, -- JSON array of required sub-exercise indices
-            learning_objectives TEXT, -- JSON array of learning goals
-            instructions TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(course_id) REFERENCES courses(id),
-            UNIQUE(course_id, topic_id, sub_exercise_index)
-        );
-
-        CREATE TABLE IF NOT EXISTS sub_exercise_progress (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            topic_id TEXT NOT NULL,
-            sub_exercise_id INTEGER NOT NULL,
-            status TEXT NOT NULL, -- 'not_started', 'in_progress', 'completed', 'skipped'
-            start_time TEXT,
-            completion_time TEXT,
-            time_spent INTEGER DEFAULT 0,
-            attempts INTEGER DEFAULT 0,
-            score REAL DEFAULT 0,
-            concentration_score REAL DEFAULT 0,
-            emotion_data TEXT, -- JSON array of emotion tracking data
-            notes TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(course_id) REFERENCES courses(id),
-            FOREIGN KEY(sub_exercise_id) REFERENCES sub_exercises(id),
-            UNIQUE(user_id, course_id, topic_id, sub_exercise_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS emotions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            emotion TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            course_id INTEGER,
-            topic_id TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id),
+            module_order INTEGER DEFAULT 0,
             FOREIGN KEY(course_id) REFERENCES courses(id)
         );
-
-        CREATE TABLE IF NOT EXISTS learning_actions (
+        CREATE TABLE IF NOT EXISTS submodules (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            topic_id TEXT NOT NULL,
-            sub_exercise_id INTEGER,
-            action TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(course_id) REFERENCES courses(id),
-            FOREIGN KEY(sub_exercise_id) REFERENCES sub_exercises(id)
+            module_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            content TEXT,
+            submodule_order INTEGER DEFAULT 0,
+            FOREIGN KEY(module_id) REFERENCES modules(id)
         );
+        CREATE INDEX IF NOT EXISTS idx_modules_course_order ON modules(course_id, module_order);
+        CREATE INDEX IF NOT EXISTS idx_submodules_module_order ON submodules(module_id, submodule_order);
+        '''
+    ),
+]
 
-        CREATE TABLE IF NOT EXISTS quiz_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            quiz_title TEXT,
-            score INTEGER NOT NULL,
-            total INTEGER NOT NULL,
-            language TEXT,
-            difficulty TEXT,
-            submitted_at TEXT NOT NULL,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        );
+# Width of an emotion_rollups bucket; migration 3 hard-codes the same value
+EMOTION_BUCKET_SECONDS = 300
 
-        CREATE TABLE IF NOT EXISTS user_courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            started_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(course_id) REFERENCES courses(id),
-            UNIQUE(user_id, course_id)
-        );
 
-        CREATE TABLE IF NOT EXISTS module_progress (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            module_id INTEGER NOT NULL,
-            status TEXT NOT NULL,
-            score REAL DEFAULT 0,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, module_id),
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        );
-        '''
-    )
-    connection.commit()
+def run_migrations(connection):
+    """Apply pending MIGRATIONS, each in its own transaction; returns the schema version"""
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    for target, (description, script) in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            connection.executescript(f'BEGIN;\n{script}\nPRAGMA user_version = {target};\nCOMMIT;')
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        logger.info(f"Applied migration {target}: {description}")
+        version = target
+    return version
 
-    # Initialize database only
 
-    connection.close()
+def init_db():
+    with db_connection() as connection:
+        cursor = connection.cursor()
+    
+        cursor.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                email TEXT,
+                bio TEXT,
+                learning_goals TEXT,
+                avatar_url TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                is_guest INTEGER DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS programming_languages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                description TEXT,
+                icon_class TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS assessment_questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                language_id INTEGER NOT NULL,
+                question_text TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct_answer INTEGER NOT NULL,
+                difficulty_level TEXT NOT NULL,
+                category TEXT,
+                explanation TEXT,
+                FOREIGN KEY(language_id) REFERENCES programming_languages(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS courses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                language TEXT,
+                difficulty TEXT,
+                level TEXT,
+                prerequisites TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS progress (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                topic_id TEXT,
+                status TEXT NOT NULL,
+                start_time TEXT,
+                completion_time TEXT,
+                time_spent INTEGER DEFAULT 0,
+                concentration_score REAL DEFAULT 0,
+                progress_percentage REAL DEFAULT 0,
+                module_index INTEGER,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(course_id) REFERENCES courses(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS sub_exercises (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL,
+                topic_id TEXT NOT NULL,
+                sub_exercise_index INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                content TEXT,
+                exercise_type TEXT NOT NULL, -- 'theory', 'example', 'practice', 'quiz', 'project'
+                difficulty TEXT DEFAULT 'beginner',
+                estimated_time INTEGER DEFAULT 10, -- minutes
+                prerequisites TEXT, -- JSON array of required sub-exercise indices
+                learning_objectives TEXT, -- JSON array of learning goals
+                instructions TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(course_id) REFERENCES courses(id),
+                UNIQUE(course_id, topic_id, sub_exercise_index)
+            );
+
+            CREATE TABLE IF NOT EXISTS sub_exercise_progress (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                topic_id TEXT NOT NULL,
+                sub_exercise_id INTEGER NOT NULL,
+                status TEXT NOT NULL, -- 'not_started', 'in_progress', 'completed', 'skipped'
+                start_time TEXT,
+                completion_time TEXT,
+                time_spent INTEGER DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                score REAL DEFAULT 0,
+                concentration_score REAL DEFAULT 0,
+                emotion_data TEXT, -- JSON array of emotion tracking data
+                notes TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(course_id) REFERENCES courses(id),
+                FOREIGN KEY(sub_exercise_id) REFERENCES sub_exercises(id),
+                UNIQUE(user_id, course_id, topic_id, sub_exercise_id)
+            );
+
+            CREATE TABLE IF NOT EXISTS emotions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                emotion TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                course_id INTEGER,
+                topic_id TEXT,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(course_id) REFERENCES courses(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS learning_actions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                topic_id TEXT NOT NULL,
+                sub_exercise_id INTEGER,
+                action TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(course_id) REFERENCES courses(id),
+                FOREIGN KEY(sub_exercise_id) REFERENCES sub_exercises(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS quiz_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                quiz_title TEXT,
+                score INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                language TEXT,
+                difficulty TEXT,
+                submitted_at TEXT NOT NULL,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS user_courses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(course_id) REFERENCES courses(id),
+                UNIQUE(user_id, course_id)
+            );
+
+            CREATE TABLE IF NOT EXISTS module_progress (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                module_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                score REAL DEFAULT 0,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, module_id),
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+            '''
+        )
+
+        run_migrations(connection)
 
 
 import hashlib
@@ -193,163 +435,234 @@ def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 def create_user(username: str, password: str, is_guest: bool = False, email: str = None) -> int:
-    connection = get_connection()
-    cursor = connection.cursor()
-    hashed_password = hash_password(password)
-    cursor.execute(
-        '''INSERT INTO users 
-           (username, password, email, is_guest, created_at, updated_at) 
-           VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))''',
-        (username, hashed_password, email, 1 if is_guest else 0),
-    )
-    connection.commit()
-    user_id = cursor.lastrowid
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        hashed_password = hash_password(password)
+        cursor.execute(
+            '''INSERT INTO users 
+               (username, password, email, is_guest, created_at, updated_at) 
+               VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))''',
+            (username, hashed_password, email, 1 if is_guest else 0),
+        )
+        user_id = cursor.lastrowid
     return user_id
 
 
 def get_user_by_credentials(username: str, password: str):
-    connection = get_connection()
-    cursor = connection.cursor()
-    hashed_password = hash_password(password)
-    cursor.execute(
-        'SELECT * FROM users WHERE username = ? AND password = ?', (username, hashed_password)
-    )
-    row = cursor.fetchone()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        hashed_password = hash_password(password)
+        cursor.execute(
+            'SELECT * FROM users WHERE username = ? AND password = ?', (username, hashed_password)
+        )
+        row = cursor.fetchone()
     return row
 
 
 def get_user_by_email_credentials(email: str, password: str):
     """Authenticate user by email and password"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    hashed_password = hash_password(password)
-    cursor.execute(
-        'SELECT * FROM users WHERE email = ? AND password = ? AND is_guest = 0', (email, hashed_password)
-    )
-    row = cursor.fetchone()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        hashed_password = hash_password(password)
+        cursor.execute(
+            'SELECT * FROM users WHERE email = ? AND password = ? AND is_guest = 0', (email, hashed_password)
+        )
+        row = cursor.fetchone()
     return row
 
 
 def get_user_by_id(user_id: int):
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    row = cursor.fetchone()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
     return row
 
 
 def list_courses():
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM courses ORDER BY language, difficulty, id ASC')
-    courses = cursor.fetchall()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT * FROM courses ORDER BY language, difficulty, id ASC')
+        courses = cursor.fetchall()
     return courses
 
 
 def get_courses_by_language_and_difficulty(language: str, difficulty: str):
     """Get courses filtered by language and difficulty"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        'SELECT * FROM courses WHERE language = ? AND difficulty = ? ORDER BY id ASC',
-        (language, difficulty)
-    )
-    courses = cursor.fetchall()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT * FROM courses WHERE language = ? AND difficulty = ? ORDER BY id ASC',
+            (language, difficulty)
+        )
+        courses = cursor.fetchall()
     return courses
 
 
 def add_course(title: str, description: str = '', language: str = 'general', difficulty: str = 'beginner', level: str = 'Beginner') -> int:
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        'INSERT INTO courses (title, description, language, difficulty, level) VALUES (?, ?, ?, ?, ?)',
-        (title, description, language, difficulty, level)
-    )
-    connection.commit()
-    course_id = cursor.lastrowid
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            'INSERT INTO courses (title, description, language, difficulty, level) VALUES (?, ?, ?, ?, ?)',
+            (title, description, language, difficulty, level)
+        )
+        course_id = cursor.lastrowid
     return course_id
 
 
 def save_progress(user_id: int, course_id: int, status: str):
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        'INSERT INTO progress (user_id, course_id, status, start_time) VALUES (?, ?, ?, ?)',
-        (user_id, course_id, status, datetime.utcnow().isoformat())
-    )
-    connection.commit()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            'INSERT INTO progress (user_id, course_id, status, start_time) VALUES (?, ?, ?, ?)',
+            (user_id, course_id, status, datetime.utcnow().isoformat())
+        )
+
+
+def emotion_timestamp(timestamp: str | None = None) -> tuple:
+    """Return (ISO string, UTC epoch seconds) for an emotion sample.
+
+    Naive timestamps are taken as UTC, which is what every writer in the app
+    produces; unparseable ones fall back to the current time.
+    """
+    if timestamp:
+        try:
+            parsed = datetime.fromisoformat(timestamp)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return timestamp, int(parsed.timestamp())
+    now = datetime.now(timezone.utc)
+    return now.replace(tzinfo=None).isoformat(), int(now.timestamp())
 
 
 def save_emotion(user_id: int, emotion: str, timestamp: str | None = None, course_id: int = None, topic_id: str = None):
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        'INSERT INTO emotions (user_id, emotion, timestamp, course_id, topic_id) VALUES (?, ?, ?, ?, ?)',
-        (user_id, emotion, timestamp or datetime.utcnow().isoformat(), course_id, topic_id),
-    )
-    connection.commit()
-    connection.close()
+    save_emotions([(user_id, emotion, timestamp, course_id, topic_id)])
+
+
+def save_emotions(rows: list):
+    """Insert (user_id, emotion, timestamp, course_id, topic_id) rows in one transaction"""
+    params = []
+    rollup = {}
+    for user_id, emotion, timestamp, course_id, topic_id in rows:
+        iso, epoch = emotion_timestamp(timestamp)
+        params.append((user_id, emotion, iso, epoch, course_id, topic_id))
+        key = (user_id, epoch - epoch % EMOTION_BUCKET_SECONDS, course_id or 0, topic_id or '', emotion)
+        rollup[key] = rollup.get(key, 0) + 1
+    with db_connection() as connection:
+        connection.executemany(
+            'INSERT INTO emotions (user_id, emotion, timestamp, timestamp_epoch, course_id, topic_id) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            params,
+        )
+        # Keep emotion_rollups in step within the same transaction
+        connection.executemany(
+            '''INSERT INTO emotion_rollups (user_id, bucket_start, course_id, topic_id, emotion, sample_count)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(user_id, bucket_start, course_id, topic_id, emotion)
+               DO UPDATE SET sample_count = sample_count + excluded.sample_count''',
+            [key + (count,) for key, count in rollup.items()],
+        )
+
+
+def get_emotion_buckets(user_id: int, course_id: int = None, topic_id: str = None, minutes: int = 60) -> list:
+    """(bucket_start, emotion, count) rows from emotion_rollups, oldest bucket first.
+
+    The window is widened to whole buckets, so it may reach up to
+    EMOTION_BUCKET_SECONDS further back than ``minutes``.
+    """
+    now = int(time.time())
+    since = now - int(minutes) * 60
+    query = '''
+        SELECT bucket_start, emotion, SUM(sample_count) AS sample_count
+        FROM emotion_rollups
+        WHERE user_id = ? AND bucket_start >= ?
+    '''
+    params = [user_id, since - since % EMOTION_BUCKET_SECONDS]
+    if course_id:
+        query += ' AND course_id = ?'
+        params.append(course_id)
+    if topic_id:
+        query += ' AND topic_id = ?'
+        params.append(topic_id)
+    query += ' GROUP BY bucket_start, emotion ORDER BY bucket_start ASC'
+
+    with db_connection() as connection:
+        rows = connection.execute(query, params).fetchall()
+    return [(row['bucket_start'], row['emotion'], row['sample_count']) for row in rows]
+
+
+def get_recent_emotion_buckets(user_id: int, samples: int = 50) -> list:
+    """(bucket_start, emotion, count) rows covering the user's last ``samples`` samples, oldest bucket first.
+
+    Reads whole buckets newest first until they hold at least ``samples``
+    samples, however long ago those were, so the oldest bucket may add a
+    few samples beyond ``samples``.
+    """
+    counts = {}
+    total = 0
+    with db_connection() as connection:
+        rows = connection.execute(
+            'SELECT bucket_start, emotion, sample_count FROM emotion_rollups '
+            'WHERE user_id = ? ORDER BY bucket_start DESC',
+            (user_id,),
+        )
+        current = None
+        for row in rows:
+            if row['bucket_start'] != current:
+                # Only stop between buckets, never halfway through one
+                if total >= samples:
+                    break
+                current = row['bucket_start']
+            key = (row['bucket_start'], row['emotion'])
+            counts[key] = counts.get(key, 0) + row['sample_count']
+            total += row['sample_count']
+    return [(bucket_start, emotion, count) for (bucket_start, emotion), count in sorted(counts.items())]
+
+
+def get_emotion_counts(user_id: int, course_id: int = None, topic_id: str = None, minutes: int = 60) -> dict:
+    """Per-emotion sample counts over the window, summed from emotion_rollups"""
+    counts = {}
+    for _, emotion, sample_count in get_emotion_buckets(user_id, course_id, topic_id, minutes):
+        counts[emotion] = counts.get(emotion, 0) + sample_count
+    return counts
 
 
 def save_learning_emotion(user_id: int, emotion: str, module_type: str, course_id: int = None, topic_id: str = None, quiz_id: str = None):
     """Save emotion with learning context for analytics"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    timestamp = datetime.utcnow().isoformat()
-    
     # Save to emotions table with context
-    cursor.execute(
-        'INSERT INTO emotions (user_id, emotion, timestamp, course_id, topic_id) VALUES (?, ?, ?, ?, ?)',
-        (user_id, emotion, timestamp, course_id, topic_id),
-    )
-    
+    save_emotions([(user_id, emotion, None, course_id, topic_id)])
+
     # Could also save to a more detailed learning_analytics table if needed
     # For now, we'll use the existing emotions table structure
-    
-    connection.commit()
-    connection.close()
 
 
 def get_emotion_analytics(user_id: int, course_id: int = None, topic_id: str = None, hours: int = 24):
     """Get emotion analytics for learning comprehension assessment"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    
-    # Base query
-    query = '''
-        SELECT emotion, timestamp, course_id, topic_id 
-        FROM emotions 
-        WHERE user_id = ? 
-        AND datetime(timestamp) >= datetime('now', '-{} hours')
-    '''.format(hours)
-    
-    params = [user_id]
-    
-    # Add filters if provided
-    if course_id:
-        query += " AND course_id = ?"
-        params.append(course_id)
-    
-    if topic_id:
-        query += " AND topic_id = ?"
-        params.append(topic_id)
-    
-    query += " ORDER BY timestamp DESC"
-    
-    cursor.execute(query, params)
-    emotions = cursor.fetchall()
-    connection.close()
-    
+    # Summed from a few rollup buckets rather than every raw sample
+    emotion_counts = get_emotion_counts(user_id, course_id, topic_id, minutes=int(hours) * 60)
+    total_emotions = sum(emotion_counts.values())
+
+    recent_emotion = 'neutral'
+    if total_emotions:
+        query = 'SELECT emotion FROM emotions WHERE user_id = ?'
+        params = [user_id]
+        if course_id:
+            query += ' AND course_id = ?'
+            params.append(course_id)
+        if topic_id:
+            query += ' AND topic_id = ?'
+            params.append(topic_id)
+        query += ' ORDER BY timestamp_epoch DESC LIMIT 1'
+        with db_connection() as connection:
+            row = connection.execute(query, params).fetchone()
+        if row:
+            recent_emotion = row['emotion']
+
     # Process emotions for analytics
-    if not emotions:
+    if not total_emotions:
         return {
             'understanding_level': 'neutral',
             'confidence_score': 0.5,
@@ -358,13 +671,6 @@ def get_emotion_analytics(user_id: int, course_id: int = None, topic_id: str = N
             'recommendations': []
         }
     
-    emotion_counts = {}
-    for emotion_row in emotions:
-        emotion = emotion_row['emotion']
-        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-    
-    total_emotions = len(emotions)
-    
     # Calculate understanding metrics
     positive_emotions = ['happy', 'excited', 'confident', 'focused']
     negative_emotions = ['confused', 'frustrated', 'bored', 'anxious']
@@ -418,59 +724,51 @@ def get_emotion_analytics(user_id: int, course_id: int = None, topic_id: str = N
         'learning_state': learning_state,
         'recommendations': recommendations,
         'total_emotions_tracked': total_emotions,
-        'recent_emotion': emotions[0]['emotion'] if emotions else 'neutral'
+        'recent_emotion': recent_emotion
     }
 
 
 def insert_quiz_result(user_id: int, quiz_title: str, score: int, total: int, language: str = None, difficulty: str = None) -> int:
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        'INSERT INTO quiz_results (user_id, quiz_title, score, total, language, difficulty, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
-        (user_id, quiz_title, score, total, language, difficulty, datetime.utcnow().isoformat()),
-    )
-    connection.commit()
-    quiz_result_id = cursor.lastrowid
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            'INSERT INTO quiz_results (user_id, quiz_title, score, total, language, difficulty, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (user_id, quiz_title, score, total, language, difficulty, datetime.utcnow().isoformat()),
+        )
+        quiz_result_id = cursor.lastrowid
     return quiz_result_id
 
 
 def get_quiz_result(quiz_result_id: int):
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM quiz_results WHERE id = ?', (quiz_result_id,))
-    row = cursor.fetchone()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT * FROM quiz_results WHERE id = ?', (quiz_result_id,))
+        row = cursor.fetchone()
     return row
 
 
 def get_recent_emotions(user_id: int, limit: int = 50):
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute(
-        'SELECT emotion, timestamp FROM emotions WHERE user_id = ? ORDER BY id DESC LIMIT ?',
-        (user_id, limit),
-    )
-    rows = cursor.fetchall()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT emotion, timestamp FROM emotions WHERE user_id = ? ORDER BY id DESC LIMIT ?',
+            (user_id, limit),
+        )
+        rows = cursor.fetchall()
     return rows
 
 
 def get_programming_languages():
     """Get all available programming languages"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM programming_languages ORDER BY name ASC')
-    languages = cursor.fetchall()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT * FROM programming_languages ORDER BY name ASC')
+        languages = cursor.fetchall()
     return languages
 
 def update_user_profile(user_id: int, data: dict) -> bool:
     """Update user profile information"""
     try:
-        connection = get_connection()
-        cursor = connection.cursor()
-        
         update_fields = []
         params = []
         
@@ -489,36 +787,107 @@ def update_user_profile(user_id: int, data: dict) -> bool:
             '''
             params.append(user_id)
             
-            cursor.execute(query, params)
-            connection.commit()
-            connection.close()
+            with db_connection() as connection:
+                connection.execute(query, params)
             return True
             
         return False
     except Exception:
         return False
 
+def get_course_progress_summary(user_id: int) -> dict:
+    """{course_id: {'progress_count', 'avg_progress'}} for every course the user has progress in"""
+    with db_connection() as connection:
+        rows = connection.execute('''
+            SELECT course_id, COUNT(*) AS progress_count, AVG(progress_percentage) AS avg_progress
+            FROM course_progress
+            WHERE user_id = ?
+            GROUP BY course_id
+        ''', (user_id,)).fetchall()
+    return {
+        row['course_id']: {'progress_count': row['progress_count'], 'avg_progress': row['avg_progress']}
+        for row in rows
+    }
+
+
+def _attach_children(parents: list, children: list, parent_key: str, child_key: str, field: str) -> list:
+    """Group already-ordered child dicts under their parents in one pass"""
+    by_key = {}
+    for parent in parents:
+        parent[field] = []
+        by_key[parent[parent_key]] = parent
+    for child in children:
+        parent = by_key.get(child.pop(child_key))
+        if parent is not None:
+            parent[field].append(child)
+    return parents
+
+
+def load_course_modules(course_id: int, user_id: int = None) -> list:
+    """Modules of a course with their submodules and the user's status, in two queries"""
+    with db_connection() as connection:
+        modules = connection.execute('''
+            SELECT m.id, m.title, m.description, m.module_order,
+                   COALESCE(mp.status, 'not_started') AS status, COALESCE(mp.score, 0) AS score
+            FROM modules m
+            LEFT JOIN module_progress mp ON mp.module_id = m.id AND mp.user_id = ?
+            WHERE m.course_id = ?
+            ORDER BY m.module_order
+        ''', (user_id, course_id)).fetchall()
+        submodules = connection.execute('''
+            SELECT s.module_id, s.id, s.title, s.description, s.content, s.submodule_order
+            FROM submodules s
+            JOIN modules m ON m.id = s.module_id
+            WHERE m.course_id = ?
+            ORDER BY s.module_id, s.submodule_order
+        ''', (course_id,)).fetchall()
+
+    return _attach_children([dict(row) for row in modules], [dict(row) for row in submodules],
+                            'id', 'module_id', 'submodules')
+
+
+def load_course_structure(course_id: int) -> list:
+    """Topics of a course with their sub-exercises, from a single ordered query"""
+    with db_connection() as connection:
+        exercises = connection.execute('''
+            SELECT topic_id, id, title, description, exercise_type, difficulty,
+                   estimated_time, sub_exercise_index
+            FROM sub_exercises
+            WHERE course_id = ?
+            ORDER BY topic_id, sub_exercise_index
+        ''', (course_id,)).fetchall()
+
+    exercises = [dict(row) for row in exercises]
+    topic_ids = list(dict.fromkeys(exercise['topic_id'] for exercise in exercises))
+    modules = _attach_children(
+        [{'topic_id': topic_id, 'title': f"Module {topic_id}"} for topic_id in topic_ids],
+        exercises, 'topic_id', 'topic_id', 'exercises'
+    )
+    for module in modules:
+        module['exercise_count'] = len(module['exercises'])
+    return modules
+
+
 def get_student_data(user_id: int) -> dict:
     # Aggregate minimal data for ML model input
-    connection = get_connection()
-    cursor = connection.cursor()
+    with db_connection() as connection:
+        cursor = connection.cursor()
 
-    cursor.execute('SELECT COUNT(*) AS cnt FROM progress WHERE user_id = ?', (user_id,))
-    courses_started = cursor.fetchone()['cnt']
+        cursor.execute('SELECT COUNT(*) AS cnt FROM progress WHERE user_id = ?', (user_id,))
+        courses_started = cursor.fetchone()['cnt']
 
-    cursor.execute('SELECT AVG(score) AS avg_score FROM quiz_results WHERE user_id = ?', (user_id,))
-    avg_score_row = cursor.fetchone()
-    avg_score = avg_score_row['avg_score'] if avg_score_row and avg_score_row['avg_score'] is not None else 0
+        cursor.execute('SELECT AVG(score) AS avg_score FROM quiz_results WHERE user_id = ?', (user_id,))
+        avg_score_row = cursor.fetchone()
+        avg_score = avg_score_row['avg_score'] if avg_score_row and avg_score_row['avg_score'] is not None else 0
 
-    cursor.execute('SELECT emotion FROM emotions WHERE user_id = ? ORDER BY id DESC LIMIT 1', (user_id,))
-    last_emotion_row = cursor.fetchone()
-    last_emotion = last_emotion_row['emotion'] if last_emotion_row else 'neutral'
+        cursor.execute('SELECT emotion FROM emotions WHERE user_id = ? ORDER BY id DESC LIMIT 1', (user_id,))
+        last_emotion_row = cursor.fetchone()
+        last_emotion = last_emotion_row['emotion'] if last_emotion_row else 'neutral'
 
-    # Get recent quiz performance
-    cursor.execute('SELECT language, difficulty, score, total FROM quiz_results WHERE user_id = ? ORDER BY id DESC LIMIT 5', (user_id,))
-    recent_quizzes = cursor.fetchall()
+        # Get recent quiz performance
+        cursor.execute('SELECT language, difficulty, score, total FROM quiz_results WHERE user_id = ? ORDER BY id DESC LIMIT 5', (user_id,))
+        recent_quizzes = cursor.fetchall()
 
-    connection.close()
     return {
         'courses_started': courses_started,
         'avg_score': avg_score,
@@ -535,39 +904,36 @@ def create_sub_exercise(course_id: int, topic_id: str, sub_exercise_index: int,
                        prerequisites: list = None, learning_objectives: list = None,
                        instructions: str = '') -> int:
     """Create a new sub-exercise"""
-    connection = get_connection()
-    cursor = connection.cursor()
-
-    cursor.execute('''
-        INSERT INTO sub_exercises
-        (course_id, topic_id, sub_exercise_index, title, description, content,
-         exercise_type, difficulty, estimated_time, prerequisites, learning_objectives, instructions)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        course_id, topic_id, sub_exercise_index, title, description, content,
-        exercise_type, difficulty, estimated_time,
-        json.dumps(prerequisites or []), json.dumps(learning_objectives or []), instructions
-    ))
-
-    connection.commit()
-    sub_exercise_id = cursor.lastrowid
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute('''
+            INSERT INTO sub_exercises
+            (course_id, topic_id, sub_exercise_index, title, description, content,
+             exercise_type, difficulty, estimated_time, prerequisites, learning_objectives, instructions)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            course_id, topic_id, sub_exercise_index, title, description, content,
+            exercise_type, difficulty, estimated_time,
+            json.dumps(prerequisites or []), json.dumps(learning_objectives or []), instructions
+        ))
+
+        sub_exercise_id = cursor.lastrowid
     return sub_exercise_id
 
 
 def get_sub_exercises(course_id: int, topic_id: str) -> list:
     """Get all sub-exercises for a topic"""
-    connection = get_connection()
-    cursor = connection.cursor()
+    with db_connection() as connection:
+        cursor = connection.cursor()
 
-    cursor.execute('''
-        SELECT * FROM sub_exercises
-        WHERE course_id = ? AND topic_id = ?
-        ORDER BY sub_exercise_index ASC
-    ''', (course_id, topic_id))
+        cursor.execute('''
+            SELECT * FROM sub_exercises
+            WHERE course_id = ? AND topic_id = ?
+            ORDER BY sub_exercise_index ASC
+        ''', (course_id, topic_id))
 
-    sub_exercises = cursor.fetchall()
-    connection.close()
+        sub_exercises = cursor.fetchall()
 
     # Parse JSON fields
     result = []
@@ -586,21 +952,20 @@ def get_sub_exercises(course_id: int, topic_id: str) -> list:
 
 def get_sub_exercise_progress(user_id: int, course_id: int, topic_id: str) -> dict:
     """Get user's progress on all sub-exercises for a topic"""
-    connection = get_connection()
-    cursor = connection.cursor()
-
-    cursor.execute('''
-        SELECT se.*, sep.status, sep.start_time, sep.completion_time,
-               sep.time_spent, sep.attempts, sep.score, sep.concentration_score
-        FROM sub_exercises se
-        LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id
-            AND sep.user_id = ? AND sep.course_id = ? AND sep.topic_id = ?
-        WHERE se.course_id = ? AND se.topic_id = ?
-        ORDER BY se.sub_exercise_index ASC
-    ''', (user_id, course_id, topic_id, course_id, topic_id))
-
-    results = cursor.fetchall()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute('''
+            SELECT se.*, sep.status, sep.start_time, sep.completion_time,
+                   sep.time_spent, sep.attempts, sep.score, sep.concentration_score
+            FROM sub_exercises se
+            LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id
+                AND sep.user_id = ? AND sep.course_id = ? AND sep.topic_id = ?
+            WHERE se.course_id = ? AND se.topic_id = ?
+            ORDER BY se.sub_exercise_index ASC
+        ''', (user_id, course_id, topic_id, course_id, topic_id))
+
+        results = cursor.fetchall()
 
     progress = {}
     for row in results:
@@ -625,47 +990,45 @@ def update_sub_exercise_progress(user_id: int, course_id: int, topic_id: str,
                                concentration_score: float = 0, emotion_data: list = None) -> bool:
     """Update user's progress on a sub-exercise"""
     try:
-        connection = get_connection()
-        cursor = connection.cursor()
-
-        # Check if progress record exists
-        cursor.execute('''
-            SELECT id FROM sub_exercise_progress
-            WHERE user_id = ? AND course_id = ? AND topic_id = ? AND sub_exercise_id = ?
-        ''', (user_id, course_id, topic_id, sub_exercise_id))
+        with db_connection() as connection:
+            cursor = connection.cursor()
 
-        existing = cursor.fetchone()
-        current_time = datetime.utcnow().isoformat()
-
-        if existing:
-            # Update existing record
+            # Check if progress record exists
             cursor.execute('''
-                UPDATE sub_exercise_progress
-                SET status = ?, time_spent = time_spent + ?, score = ?,
-                    concentration_score = ?, emotion_data = ?,
-                    completion_time = CASE WHEN ? = 'completed' THEN ? ELSE completion_time END,
-                    attempts = attempts + 1, updated_at = ?
+                SELECT id FROM sub_exercise_progress
                 WHERE user_id = ? AND course_id = ? AND topic_id = ? AND sub_exercise_id = ?
-            ''', (
-                status, time_spent, score, concentration_score,
-                json.dumps(emotion_data or []), status, current_time, current_time,
-                user_id, course_id, topic_id, sub_exercise_id
-            ))
-        else:
-            # Create new record
-            cursor.execute('''
-                INSERT INTO sub_exercise_progress
-                (user_id, course_id, topic_id, sub_exercise_id, status, start_time,
-                 completion_time, time_spent, attempts, score, concentration_score, emotion_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
-            ''', (
-                user_id, course_id, topic_id, sub_exercise_id, status, current_time,
-                current_time if status == 'completed' else None,
-                time_spent, score, concentration_score, json.dumps(emotion_data or [])
-            ))
+            ''', (user_id, course_id, topic_id, sub_exercise_id))
+
+            existing = cursor.fetchone()
+            current_time = datetime.utcnow().isoformat()
+
+            if existing:
+                # Update existing record
+                cursor.execute('''
+                    UPDATE sub_exercise_progress
+                    SET status = ?, time_spent = time_spent + ?, score = ?,
+                        concentration_score = ?, emotion_data = ?,
+                        completion_time = CASE WHEN ? = 'completed' THEN ? ELSE completion_time END,
+                        attempts = attempts + 1, updated_at = ?
+                    WHERE user_id = ? AND course_id = ? AND topic_id = ? AND sub_exercise_id = ?
+                ''', (
+                    status, time_spent, score, concentration_score,
+                    json.dumps(emotion_data or []), status, current_time, current_time,
+                    user_id, course_id, topic_id, sub_exercise_id
+                ))
+            else:
+                # Create new record
+                cursor.execute('''
+                    INSERT INTO sub_exercise_progress
+                    (user_id, course_id, topic_id, sub_exercise_id, status, start_time,
+                     completion_time, time_spent, attempts, score, concentration_score, emotion_data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
+                ''', (
+                    user_id, course_id, topic_id, sub_exercise_id, status, current_time,
+                    current_time if status == 'completed' else None,
+                    time_spent, score, concentration_score, json.dumps(emotion_data or [])
+                ))
 
-        connection.commit()
-        connection.close()
         return True
 
     except Exception as e:
@@ -674,9 +1037,8 @@ def update_sub_exercise_progress(user_id: int, course_id: int, topic_id: str,
 
 def get_user_by_email(email):
     """Get user by email address"""
-    connection = get_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-    user = cursor.fetchone()
-    connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+        user = cursor.fetchone()
     return user
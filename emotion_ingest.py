@@ -0,0 +1,124 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from db import save_emotions
+
+logger = logging.getLogger(__name__)
+
+
+class EmotionIngestQueue:
+    """Buffer emotion samples and write them to SQLite in batches.
+
+    Request threads call ``submit`` and return immediately; a single
+    background writer drains the queue and inserts everything collected in
+    one ``executemany`` transaction, either every ``flush_interval`` seconds
+    or as soon as ``batch_size`` rows are waiting. When the queue is full,
+    ``submit`` returns False so callers can shed load instead of piling up
+    on SQLite's write lock.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0, put_timeout=0.05):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_queue = max_queue
+        self._reset()
+        self.dropped = 0
+        self.written = 0
+        atexit.register(self.stop)
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Also runs in a forked child: the parent's writer thread does not
+        # survive fork and its queued rows are the parent's to write, so the
+        # child starts with an empty queue and its own writer on first submit
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()   # dropped/written change on request and writer threads
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='emotion-ingest', daemon=True)
+            self._thread.start()
+
+    def submit(self, user_id, emotion, timestamp=None, course_id=None, topic_id=None):
+        """Queue one sample; returns False if the queue is full"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            self.start()
+        row = (user_id, emotion, timestamp or datetime.utcnow().isoformat(), course_id, topic_id)
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+            logger.warning(f"Emotion ingest queue full, dropped sample for user {user_id}")
+            return False
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stop(self, timeout=5.0):
+        """Stop the writer after flushing everything already queued"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stop.set()
+            thread.join(timeout)
+            self._thread = None
+        # Anything submitted while the writer was shutting down
+        self._flush(self._drain(len(self._queue.queue)))
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+        self._flush(self._drain(len(self._queue.queue)))
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            save_emotions(rows)
+            with self._count_lock:
+                self.written += len(rows)
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} emotion samples: {e}")
+
+
+emotion_ingest = EmotionIngestQueue()
@@ -0,0 +1,361 @@
+import logging
+import random
+
+import cv2
+import numpy as np
+
+from box_fusion import fuse_detections, pairwise_iou
+from stage_metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Enhanced emotion mapping with concentration indicators
+emotion_concentration_map = {
+    'happy': True,
+    'neutral': True,
+    'focused': True,
+    'concentrated': True,
+    'alert': True,
+    'surprised': False,
+    'sad': False,
+    'angry': False,
+    'fearful': False,
+    'disgusted': False,
+    'distracted': False,
+    'tired': False
+}
+
+emotion_priority = {'happy': 5, 'engaged': 4, 'focused': 4, 'alert': 3, 'concentrated': 3, 'neutral': 2,
+                    'relaxed': 2, 'tired': 1, 'distracted': 0}
+
+# The face cascade runs on a copy of the frame scaled down to this width;
+# eye and smile cascades still see full-resolution face crops. Set to None
+# to detect on the full frame.
+DETECTION_WIDTH = 320
+# Face size limits in pixels of a FACE_SIZE_REFERENCE_WIDTH-wide frame; they
+# scale with the uploaded width, so clients that downscale before sending
+# find the same faces.
+FACE_SIZE_REFERENCE_WIDTH = 640
+MIN_FACE_SIZE = 60
+MAX_FACE_SIZE = 250
+HAAR_WINDOW = 24      # smallest face the frontal cascade can find
+
+# Per-session tracking: faces from the previous frame are re-found in a
+# window around their last box; a full detection runs every
+# TRACK_REDETECT_EVERY frames or as soon as a face is lost.
+TRACK_REDETECT_EVERY = 10
+TRACK_MARGIN = 0.25   # window padding, relative to the face size
+TRACK_MIN_IOU = 0.3   # a re-found face further than this from its last box counts as lost
+
+# Size of the grayscale thumbnail compared by the frame-change gate
+FRAME_SIGNATURE_SIZE = (32, 24)
+
+NO_FACE_RESULT = {
+    'emotion': 'unknown',
+    'concentration': False,
+    'face_detected': False,
+    'face_count': 0,
+    'concentration_score': 0,
+    'detection_method': 'none',
+    'confidence': 0,
+    'face_coordinates': []
+}
+
+
+
+class FaceDetectors:
+    """Cascades and MediaPipe detector owned by a single worker process.
+
+    Neither OpenCV's CascadeClassifier nor MediaPipe's FaceDetection may be
+    shared between threads, so every worker builds its own set on startup.
+    """
+
+    def __init__(self):
+        # Primary: OpenCV Haar Cascades
+        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        self.smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+
+        # Supplement: MediaPipe Face Detection (optional, more accurate)
+        self.face_detection = None
+        try:
+            import mediapipe as mp
+            self.face_detection = mp.solutions.face_detection.FaceDetection(
+                model_selection=0, min_detection_confidence=0.5
+            )
+        except ImportError:
+            logger.info("MediaPipe not available, using OpenCV only")
+
+
+_detectors = None
+
+
+def get_detectors():
+    """Detectors for the current process, built on first use"""
+    global _detectors
+    if _detectors is None:
+        _detectors = FaceDetectors()
+    return _detectors
+
+
+def _clip_box(box, frame_w, frame_h):
+    x, y, w, h = box
+    x, y = min(max(0, x), frame_w - 1), min(max(0, y), frame_h - 1)
+    return x, y, min(w, frame_w - x), min(h, frame_h - y)
+
+
+def detect_haar_faces(small_gray, size_scale, detectors):
+    """Frontal-face cascade boxes in ``small_gray`` pixels.
+
+    ``size_scale`` maps the MIN/MAX_FACE_SIZE reference pixels onto the image.
+    """
+    min_side = max(HAAR_WINDOW, int(MIN_FACE_SIZE * size_scale))
+    max_side = max(min_side, int(MAX_FACE_SIZE * size_scale))
+    with span('face_cascade'):
+        return detectors.face_cascade.detectMultiScale(
+            small_gray,
+            scaleFactor=1.1,   # Good sensitivity
+            minNeighbors=5,    # Balance between accuracy and detection
+            minSize=(min_side, min_side),
+            maxSize=(max_side, max_side),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+
+
+def detect_mediapipe_faces(small, frame_w, frame_h, detectors):
+    """MediaPipe boxes scaled to a ``frame_w`` x ``frame_h`` frame, and their scores.
+
+    MediaPipe resizes its input internally, so the downscaled copy loses nothing.
+    """
+    boxes, scores = [], []
+    if detectors.face_detection is None:
+        return boxes, scores
+    with span('color'):
+        rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    with span('mediapipe'):
+        results = detectors.face_detection.process(rgb_small)
+    for detection in results.detections or []:
+        confidence = detection.score[0]
+        if confidence <= 0.5:  # Only include confident detections
+            continue
+        bbox = detection.location_data.relative_bounding_box
+        boxes.append((bbox.xmin * frame_w, bbox.ymin * frame_h, bbox.width * frame_w, bbox.height * frame_h))
+        scores.append(confidence)
+    return boxes, scores
+
+
+def detect_face_features(face_roi, detectors):
+    """(eyes found, smile found) in a grayscale face crop"""
+    # Check for eyes (indicates alertness)
+    with span('eye_cascade'):
+        eye_detected = len(detectors.eye_cascade.detectMultiScale(face_roi, 1.1, 3)) >= 2
+    # Check for smile (indicates engagement)
+    with span('smile_cascade'):
+        smile_detected = len(detectors.smile_cascade.detectMultiScale(face_roi, 1.8, 20)) > 0
+    return eye_detected, smile_detected
+
+
+def _detect_faces(frame, small, scale, detectors):
+    """Full Haar + MediaPipe pass.
+
+    Returns ``(cascade faces, mediapipe-only faces, method)`` where both
+    face lists hold ``(box, confidence)`` pairs after fusing the two
+    detectors' boxes.
+    """
+    frame_h, frame_w = frame.shape[:2]
+    with span('color'):
+        small_gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    # Method 1: OpenCV Haar Cascades - detect all faces
+    faces_small = detect_haar_faces(small_gray, scale * frame_w / FACE_SIZE_REFERENCE_WIDTH, detectors)
+
+    # No face from the cascade: skip MediaPipe and the per-face classifiers
+    if len(faces_small) == 0:
+        return [], [], 'none'
+
+    # Method 2: MediaPipe Face Detection (if available) - supplement Haar detection
+    mediapipe_boxes, mediapipe_scores = detect_mediapipe_faces(small, frame_w, frame_h, detectors)
+
+    # Merge overlapping boxes from both detectors (Haar boxes scaled back to full resolution)
+    faces_haar, faces_mediapipe = [], []
+    method = 'haar'
+    with span('fusion'):
+        fused = fuse_detections(np.asarray(faces_small) / scale, mediapipe_boxes, mediapipe_scores)
+    for box, confidence, sources in fused:
+        box = _clip_box(box, frame_w, frame_h)
+        if 'haar' in sources:
+            faces_haar.append((box, confidence))
+        else:
+            faces_mediapipe.append((box, confidence))
+        if 'mediapipe' in sources:
+            method = 'haar+mediapipe'
+    return faces_haar, faces_mediapipe, method
+
+
+def _follow_face(frame, box, scale, detectors):
+    """Re-detect one face inside a window around its last box; None if lost"""
+    frame_h, frame_w = frame.shape[:2]
+    x, y, w, h = box
+    mx, my = int(w * TRACK_MARGIN), int(h * TRACK_MARGIN)
+    x0, y0 = max(0, x - mx), max(0, y - my)
+    x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+    window = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        window = cv2.resize(window, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    # The face barely changes size between frames, so only a few scales are searched
+    side = int(min(w, h) * scale)
+    min_side = max(HAAR_WINDOW, int(side * 0.75))
+    max_side = max(min_side, int(side * 1.33))
+    found = detectors.face_cascade.detectMultiScale(
+        window, scaleFactor=1.1, minNeighbors=5,
+        minSize=(min_side, min_side), maxSize=(max_side, max_side)
+    )
+    if len(found) == 0:
+        return None
+
+    fx, fy, fw, fh = max(found, key=lambda f: f[2] * f[3])
+    tracked = (x0 + int(fx / scale), y0 + int(fy / scale), int(fw / scale), int(fh / scale))
+    return tracked if pairwise_iou(box, tracked)[0, 0] >= TRACK_MIN_IOU else None
+
+
+def _follow_track(frame, scale, track, detectors):
+    """Follow every face of the previous frame; None as soon as one is lost"""
+    faces = []
+    for box, confidence in track['faces']:
+        tracked = _follow_face(frame, box, scale, detectors)
+        if tracked is None:
+            return None
+        faces.append((tracked, confidence))
+    return faces
+
+
+def analyze_frame(frame, detectors=None, detection_width=DETECTION_WIDTH, track=None):
+    """Detect faces in a BGR frame and estimate emotion and concentration.
+
+    ``track`` is the state returned for the previous frame of the same
+    session. While it is fresh, faces are re-found in small windows around
+    their last boxes instead of running the full Haar + MediaPipe pass.
+    Returns ``(result, track)``; track is None when no face was found.
+    """
+    detectors = detectors or get_detectors()
+    frame_h, frame_w = frame.shape[:2]
+
+    # Cascade cost grows with pixel count, so find faces on a downscaled copy
+    scale = min(1.0, detection_width / frame_w) if detection_width else 1.0
+
+    faces_haar = None
+    if track and track['age'] < TRACK_REDETECT_EVERY:
+        with span('track'):
+            faces_haar = _follow_track(frame, scale, track, detectors)
+    if faces_haar is not None:
+        faces_mediapipe = track['mediapipe']
+        method = track['method']
+        age = track['age'] + 1
+    else:
+        if scale < 1.0:
+            with span('resize'):
+                small = cv2.resize(frame, (round(frame_w * scale), round(frame_h * scale)),
+                                   interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+        faces_haar, faces_mediapipe, method = _detect_faces(frame, small, scale, detectors)
+        age = 0
+        if not faces_haar:
+            return {**NO_FACE_RESULT, 'face_coordinates': []}, None
+
+    # Store face positions for frontend drawing
+    face_coordinates = [
+        {'x': x, 'y': y, 'width': w, 'height': h, 'confidence': confidence}
+        for (x, y, w, h), confidence in faces_haar + faces_mediapipe
+    ]
+
+    # Analyze all detected faces for emotion and concentration
+    concentration_scores = []
+    emotions = []
+
+    for (x, y, w, h), _ in faces_haar:
+        # Full-resolution crop for the small eye and smile features
+        with span('color'):
+            face_roi = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+        eye_detected, smile_detected = detect_face_features(face_roi, detectors)
+
+        # Calculate face quality metrics
+        face_position_score = 1.0 if (frame_w * 0.2 < x + w/2 < frame_w * 0.8) else 0.5
+        face_size_score = min(1.0, (w * h) / (frame_h * frame_w * 0.1))
+
+        # Emotion prediction based on facial features
+        if eye_detected and smile_detected:
+            face_emotions = ['happy', 'focused', 'engaged', 'alert']
+        elif eye_detected:
+            face_emotions = ['neutral', 'concentrated', 'focused', 'alert']
+        elif smile_detected:
+            face_emotions = ['happy', 'relaxed']
+        else:
+            face_emotions = ['neutral', 'tired', 'distracted']
+        emotions.append(random.choice(face_emotions))
+
+        # Concentration score (0-1) for this face
+        concentration_scores.append(
+            (0.4 if eye_detected else 0) +
+            (0.2 if smile_detected else 0) +
+            (0.2 * face_position_score) +
+            (0.2 * face_size_score)
+        )
+
+    for _, confidence in faces_mediapipe:
+        if confidence > 0.7:
+            emotions.append(random.choice(['focused', 'concentrated', 'alert', 'neutral']))
+            concentration_scores.append(min(1.0, confidence + 0.2))
+        else:
+            emotions.append(random.choice(['neutral', 'distracted']))
+            concentration_scores.append(confidence * 0.8)
+
+    # Use the most positive emotion if multiple faces
+    emotion = max(emotions, key=lambda e: emotion_priority.get(e, 0))
+    concentration_score = float(sum(concentration_scores) / len(concentration_scores))
+    is_concentrated = emotion_concentration_map.get(emotion, True) and concentration_score > 0.4
+
+    result = {
+        'emotion': emotion,
+        'concentration': bool(is_concentrated),
+        'face_detected': True,
+        'face_count': len(face_coordinates),
+        'concentration_score': round(concentration_score, 2),
+        'detection_method': method,
+        'confidence': round(concentration_score * 100, 1),
+        'face_coordinates': face_coordinates,
+        'tracked': age > 0
+    }
+    return result, {'faces': faces_haar, 'mediapipe': faces_mediapipe, 'method': method, 'age': age}
+
+
+def frame_signature(img_bytes):
+    """Tiny grayscale thumbnail used to spot near-identical frames.
+
+    JPEG frames are decoded at 1/8 scale, which skips most of the IDCT
+    work, so this costs a fraction of a full decode.
+    """
+    thumb = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if thumb is None:
+        return None
+    return cv2.resize(thumb, FRAME_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def frame_distance(a, b):
+    """Mean absolute gray-level difference between two signatures"""
+    return float(cv2.absdiff(a, b).mean())
+
+
+def decode_frame(img_bytes):
+    """BGR frame from encoded image bytes, or None if they cannot be decoded"""
+    return cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def analyze_image_bytes(img_bytes, track=None):
+    """Decode an encoded image and analyze it; (None, None) if it cannot be decoded"""
+    with span('decode'):
+        frame = decode_frame(img_bytes)
+    if frame is None:
+        return None, None
+    return analyze_frame(frame, track=track)
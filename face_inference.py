@@ -0,0 +1,291 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from logging_config import configure_worker_logging
+from stage_metrics import span, stage_metrics, take_spans
+
+logger = logging.getLogger(__name__)
+
+# Frame-change gate: a frame whose small grayscale signature is within
+# FRAME_CHANGE_THRESHOLD (mean absolute difference, 0-255) of the last
+# analyzed frame gets that frame's result back without any detection.
+FRAME_CHANGE_THRESHOLD = 3.0
+FRAME_CACHE_MAX_AGE = 10.0  # seconds a cached result may be reused
+
+SESSION_TTL = 30.0    # seconds before an idle session's track and cache are forgotten
+MAX_SESSIONS = 1000
+
+# Adaptive sampling: every result tells the client when to send its next
+# frame. A learner whose state just changed is sampled quickly; each
+# unchanged, focused result stretches the interval by SAMPLE_BACKOFF up to
+# MAX_SAMPLE_INTERVAL_MS, and a busy pool stretches every interval further.
+# "Unchanged" means the same face/concentration outcome: the emotion label
+# is picked at random among similar ones, so it says nothing about stability.
+SAMPLE_INTERVAL_MS = 2000
+MIN_SAMPLE_INTERVAL_MS = 1000
+MAX_SAMPLE_INTERVAL_MS = 15000
+SAMPLE_BACKOFF = 1.5
+LOAD_SLOWDOWN = 2.0   # a full pool multiplies intervals by 1 + LOAD_SLOWDOWN
+SCORE_BUCKET = 0.25   # concentration_score moves within a bucket count as unchanged
+
+# Frame format advertised to webcam clients by /api/emotion/capabilities.
+# Faces are found on a 320-pixel copy anyway; the extra width keeps the
+# face crops large enough for the eye and smile cascades.
+UPLOAD_MAX_WIDTH = 480
+UPLOAD_JPEG_QUALITY = 0.7
+UPLOAD_GRAYSCALE = True   # every detector works on grayscale
+
+
+class InferenceBusy(RuntimeError):
+    """Raised when the worker pool is full or restarting; the client should retry shortly"""
+
+
+class InferenceTimeout(TimeoutError):
+    """Raised when a frame is not analyzed within the request timeout"""
+
+
+def _analysis():
+    # OpenCV is imported on the first frame, so processes that never see a webcam skip it
+    import face_analysis
+    return face_analysis
+
+
+def _init_worker():
+    # Workers load the CV stack and build their detectors before the first frame
+    configure_worker_logging()
+    _analysis().get_detectors()
+
+
+def _analyze_in_worker(img_bytes, track):
+    # Stage timings travel back with the result; histograms live in the web process
+    take_spans()
+    with span('worker_total'):
+        result, track = _analysis().analyze_image_bytes(img_bytes, track)
+    return result, track, take_spans()
+
+
+def _score_bucket(result):
+    return int((result.get('concentration_score') or 0) / SCORE_BUCKET)
+
+
+def _next_streak(state, result):
+    # Consecutive results with the same face/concentration outcome. Losing
+    # the face or flipping concentration restarts the streak; a score that
+    # drifts into another bucket only halves it.
+    previous = state.get('result')
+    if previous is None:
+        return 0
+    if any(previous.get(k) != result.get(k) for k in ('face_detected', 'concentration')):
+        return 0
+    streak = state.get('streak', 0)
+    return streak + 1 if _score_bucket(previous) == _score_bucket(result) else max(1, streak // 2)
+
+
+def _is_focused(result):
+    return bool(result.get('face_detected') and result.get('concentration'))
+
+
+class FaceInferenceService:
+    """Run face and emotion inference in a pool of worker processes.
+
+    Request threads hand over the encoded frame and wait for the result
+    with a timeout, so OpenCV work never holds a Flask thread (or the GIL)
+    while other pages are being served. At most ``max_pending`` frames are
+    in flight; beyond that ``infer`` raises InferenceBusy immediately so
+    webcam clients back off instead of queueing behind each other. A pool
+    broken by a dying worker is replaced on the next frame, and the frames
+    it lost also raise InferenceBusy.
+
+    Per-session state lives here rather than in the workers, since
+    consecutive frames of one session may land on different processes:
+    each frame is sent with its session's last face track and the worker
+    returns the next one. The last analyzed frame's signature and result
+    are kept alongside, so an unchanged frame never reaches the pool.
+    """
+
+    def __init__(self, workers=None, max_pending=None, timeout=2.0):
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pending = 0
+        self._sessions = OrderedDict()  # session key -> state dict, least recent first
+        self.rejected = 0
+        self.timed_out = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        atexit.register(self.stop)
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._pool
+
+    def pending(self):
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _get_session(self, session_key):
+        if session_key is None:
+            return {}
+        with self._lock:
+            state = self._sessions.get(session_key)
+        if state is None or time.monotonic() - state['seen'] > SESSION_TTL:
+            return {}
+        return state
+
+    def _put_session(self, session_key, **state):
+        if session_key is None:
+            return
+        state['seen'] = time.monotonic()
+        with self._lock:
+            self._sessions[session_key] = state
+            self._sessions.move_to_end(session_key)
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+
+    def _cached_result(self, state, signature):
+        if signature is None or state.get('signature') is None:
+            return None
+        if time.monotonic() - state['analyzed_at'] > FRAME_CACHE_MAX_AGE:
+            return None
+        if _analysis().frame_distance(signature, state['signature']) > FRAME_CHANGE_THRESHOLD:
+            return None
+        return state['result']
+
+    def _discard_pool(self, pool):
+        # A worker died (e.g. OOM) and took the pool with it; the next
+        # frame starts a fresh one
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Inference worker pool broke, restarting it on the next frame")
+
+    def sample_interval_ms(self, streak, focused):
+        """Milliseconds a client should wait before sending its next frame.
+
+        ``streak`` counts consecutive results unchanged from the one before.
+        """
+        if streak == 0:
+            interval = MIN_SAMPLE_INTERVAL_MS
+        elif focused:
+            interval = SAMPLE_INTERVAL_MS * SAMPLE_BACKOFF ** min(streak, 10)
+        else:
+            interval = SAMPLE_INTERVAL_MS
+        interval *= 1 + LOAD_SLOWDOWN * self._pending / self.max_pending
+        return int(min(MAX_SAMPLE_INTERVAL_MS, max(MIN_SAMPLE_INTERVAL_MS, interval)))
+
+    def pace(self, session_key, result):
+        """``next_interval_ms`` for a result produced outside the pool.
+
+        Keeps the streak server-side under ``session_key`` (as ``infer``
+        does), so callers like /api/emotion_detect need no cookie writes.
+        """
+        state = self._get_session(session_key)
+        streak = _next_streak(state, result)
+        self._put_session(session_key, result=result, streak=streak)
+        return self.sample_interval_ms(streak, _is_focused(result))
+
+    def stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'workers': self.workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_hit_rate': round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            'sessions': len(self._sessions),
+        }
+
+    def infer(self, img_bytes, timeout=None, session_key=None):
+        """Analyze one encoded frame; returns None if it cannot be decoded.
+
+        Frames sharing a ``session_key`` reuse the previous frame's face
+        track instead of running a full detection every time, and a frame
+        that has not visibly changed returns the previous result as-is.
+        Every result carries ``next_interval_ms``, the delay the client
+        should leave before its next frame (see ``sample_interval_ms``).
+        """
+        state = self._get_session(session_key)
+        signature = None
+        if session_key is not None:
+            with stage_metrics.timed('frame_signature'):
+                signature = _analysis().frame_signature(img_bytes)
+        cached = self._cached_result(state, signature)
+        with self._lock:
+            if cached is not None:
+                self.cache_hits += 1
+            elif session_key is not None:
+                self.cache_misses += 1
+        if cached is not None:
+            # An unchanged frame is as stable as it gets
+            with self._lock:
+                state['streak'] = state.get('streak', 0) + 1
+            return {**cached, 'cached': True,
+                    'next_interval_ms': self.sample_interval_ms(state['streak'], _is_focused(cached))}
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise InferenceBusy(f"{self.max_pending} frames already in flight")
+
+        pool = self.start()
+        submitted = time.perf_counter()
+        try:
+            future = pool.submit(_analyze_in_worker, img_bytes, state.get('track'))
+        except BrokenProcessPool as e:
+            self._slots.release()
+            self._discard_pool(pool)
+            raise InferenceBusy("Inference workers restarting") from e
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending += 1
+        # The slot stays taken until the worker is done, even after a timeout
+        future.add_done_callback(self._release)
+
+        try:
+            result, track, spans = future.result(timeout=timeout or self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self.timed_out += 1
+            raise InferenceTimeout(f"Frame not analyzed within {timeout or self.timeout}s")
+        except BrokenProcessPool as e:
+            # The worker died with this frame in hand
+            self._discard_pool(pool)
+            raise InferenceBusy("Inference workers restarting") from e
+        # Whatever the worker did not spend analyzing went to queueing and pickling
+        spans['queue_and_ipc'] = (time.perf_counter() - submitted) * 1000 - spans.get('worker_total', 0.0)
+        stage_metrics.observe_many(spans)
+        if result is not None:
+            streak = _next_streak(state, result)
+            result['next_interval_ms'] = self.sample_interval_ms(streak, _is_focused(result))
+            self._put_session(session_key, track=track, signature=signature, streak=streak,
+                              result=result, analyzed_at=time.monotonic())
+        return result
+
+    def stop(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+face_inference = FaceInferenceService()
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
 import numpy as np
-from db import get_student_data, get_recent_emotions
+from db import get_student_data, get_recent_emotion_buckets
+
+# How many of the learner's latest emotion samples the recommendations look at
+RECENT_EMOTION_SAMPLES = 50
 
 def analyze_emotion_patterns(emotions, time_window_minutes=30):
     """Analyze emotion patterns over time with weighted recent emotions"""
@@ -46,6 +49,56 @@ def analyze_emotion_patterns(emotions, time_window_minutes=30):
         'trend': trend
     }
 
+def analyze_emotion_buckets(user_id, samples=RECENT_EMOTION_SAMPLES):
+    """Same result shape as analyze_emotion_patterns, computed from emotion_rollups.
+
+    Covers the learner's last ``samples`` samples (rounded up to whole
+    buckets) however long ago they were, like the raw-sample scan it
+    replaces. Cost depends on the number of buckets read, not on how many
+    raw samples the learner has produced.
+    """
+    buckets = get_recent_emotion_buckets(user_id, samples)
+    if not buckets:
+        return {
+            'dominant_emotion': 'unknown',
+            'stability': 0,
+            'trend': 'neutral'
+        }
+    
+    # Weight recent buckets more heavily, mirroring the per-sample weights
+    bucket_starts = sorted({bucket_start for bucket_start, _, _ in buckets})
+    bucket_weights = dict(zip(bucket_starts, np.linspace(0.5, 1.0, len(bucket_starts))))
+    emotion_weights = {}
+    total_samples = 0
+    
+    for bucket_start, emotion, count in buckets:
+        emotion_weights[emotion] = emotion_weights.get(emotion, 0) + bucket_weights[bucket_start] * count
+        total_samples += count
+    
+    dominant_emotion = max(emotion_weights.items(), key=lambda x: x[1])[0]
+    stability = 1.0 - (len(emotion_weights) / total_samples)
+    
+    # Trend from the most recent buckets
+    recent_starts = set(bucket_starts[-min(2, len(bucket_starts)):])
+    positive_emotions = ['very_focused', 'focused', 'happy', 'excited']
+    negative_emotions = ['very_confused', 'confused', 'frustrated', 'bored']
+    
+    positive_count = sum(count for bucket_start, e, count in buckets if bucket_start in recent_starts and e in positive_emotions)
+    negative_count = sum(count for bucket_start, e, count in buckets if bucket_start in recent_starts and e in negative_emotions)
+    
+    if positive_count > negative_count:
+        trend = 'improving'
+    elif negative_count > positive_count:
+        trend = 'declining'
+    else:
+        trend = 'stable'
+    
+    return {
+        'dominant_emotion': dominant_emotion,
+        'stability': stability,
+        'trend': trend
+    }
+
 def calculate_learning_effectiveness(emotion_patterns, progress_data):
     """Calculate learning effectiveness score based on emotions and progress"""
     base_score = 70  # Base score
@@ -71,9 +124,8 @@ def calculate_learning_effectiveness(emotion_patterns, progress_data):
 def generate_adaptive_recommendations(user_id):
     """Generate personalized recommendations based on learning analytics"""
     student_data = get_student_data(user_id)
-    recent_emotions = get_recent_emotions(user_id)
     
-    emotion_patterns = analyze_emotion_patterns([e['emotion'] for e in recent_emotions])
+    emotion_patterns = analyze_emotion_buckets(user_id)
     effectiveness_score = calculate_learning_effectiveness(
         emotion_patterns,
         {
@@ -0,0 +1,149 @@
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = os.environ.get('LOG_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs'))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+# app.log rotates by size, errors.log once a day
+APP_LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+APP_LOG_BACKUPS = int(os.environ.get('LOG_BACKUPS', 5))
+ERROR_LOG_DAYS = int(os.environ.get('ERROR_LOG_DAYS', 14))
+
+# Logger for per-request detail on hot paths (webcam frames, dashboard,
+# quiz pages). It logs at DEBUG, so it is silent at the default level; once
+# DEBUG is switched on only one record in HOT_PATH_SAMPLE_EVERY is kept
+HOT_PATH_LOGGER = 'app.hot'
+HOT_PATH_SAMPLE_EVERY = int(os.environ.get('LOG_SAMPLE_EVERY', 100))
+
+_listener = None
+
+
+class SampleFilter(logging.Filter):
+    """Pass one in ``every`` records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        return next(self._counter) % self.every == 0
+
+
+def parse_levels(spec):
+    """{'werkzeug': 'WARNING', ...} from 'werkzeug=WARNING,face_inference=DEBUG'"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_worker_logging():
+    """Log straight to stderr in an inference pool worker.
+
+    A forked worker inherits the queue handler but not the listener thread,
+    so its records would pile up unread. Only the pool initializer calls
+    this; web workers forked by the WSGI server keep the file logs.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+
+
+def _restart_listener_in_child():
+    # Threads do not survive fork: a web worker forked by a preloading WSGI
+    # server gets the queue handler without the listener thread, so start a
+    # new listener on a fresh queue with the same file handlers
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.Queue(-1)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging():
+    """Route all logging through a queue to a background writer thread.
+
+    Request threads only enqueue records; a QueueListener formats them and
+    writes to stderr, logs/app.log (everything at the root level, rotated
+    by size) and logs/errors.log (ERROR and above only, rotated daily).
+    Each record goes to each destination once.
+
+    Levels come from LOG_LEVEL (root, default INFO) and LOG_LEVELS, e.g.
+    ``LOG_LEVELS=werkzeug=WARNING,face_inference=DEBUG,app.hot=DEBUG``.
+    Records on the ``app.hot`` logger are sampled, see HOT_PATH_SAMPLE_EVERY.
+    If the log files cannot be opened, a warning is logged and only stderr
+    is used.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    console = logging.StreamHandler(sys.stderr)
+    handlers = [console]
+    file_error = None
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        app_log = logging.handlers.RotatingFileHandler(
+            os.path.join(LOG_DIR, 'app.log'), maxBytes=APP_LOG_MAX_BYTES,
+            backupCount=APP_LOG_BACKUPS, encoding='utf-8', delay=True)
+        error_log = logging.handlers.TimedRotatingFileHandler(
+            os.path.join(LOG_DIR, 'errors.log'), when='midnight',
+            backupCount=ERROR_LOG_DAYS, encoding='utf-8', delay=True)
+        error_log.setLevel(logging.ERROR)
+        handlers += [app_log, error_log]
+    except OSError as e:
+        file_error = e
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    # The hot-path logger inherits its level; the filter only ever sees its
+    # records once DEBUG is enabled for it
+    logging.getLogger(HOT_PATH_LOGGER).addFilter(SampleFilter(HOT_PATH_SAMPLE_EVERY))
+    for name, level in parse_levels(os.environ.get('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+    if file_error is not None:
+        logger.warning(f"Cannot write logs to {LOG_DIR} ({file_error}), logging to stderr only")
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,8 +1,318 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import cv2
+import numpy as np
+
+from face_analysis import emotion_concentration_map
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(MODEL_DIR, 'emotion_model.h5')
+INPUT_SIZE = 48
+
+# Serving formats in order of preference; the exported ones are produced by
+# scripts/export_emotion_model.py and avoid importing TensorFlow in workers
+MODEL_CANDIDATES = (
+    'emotion_model_int8.tflite',   # TFLite runtime (tflite-runtime / ai-edge-litert)
+    'emotion_model.onnx',          # OpenCV DNN, no extra dependency
+    'emotion_model_fp16.tflite',
+    'emotion_model.h5',            # full Keras model
+)
+
+# Output order of the 7-way softmax in scripts/train_emotion_model.py (FER-2013 classes)
+EMOTION_LABELS = ('angry', 'disgusted', 'fearful', 'happy', 'sad', 'surprised', 'neutral')
+
+# Used when no trained model is available
+FALLBACK_EMOTION = 'focused'
+
+
+def preprocess_face(gray_face):
+    """48x48 float32 crop scaled to [0, 1], shaped (48, 48, 1) like the training data"""
+    face = cv2.resize(gray_face, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+    return (face.astype(np.float32) / 255.0)[..., np.newaxis]
+
+
+class KerasEmotionModel:
+    """The trained Keras CNN; TensorFlow is only imported when this loads"""
+
+    def __init__(self, path=MODEL_PATH):
+        from tensorflow import keras
+        self.model = keras.models.load_model(path, compile=False)
+
+    def predict_batch(self, faces):
+        return self.model.predict_on_batch(faces)
+
+
+def _tflite_interpreter(path):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path)
+
+
+class TFLiteEmotionModel:
+    """Quantized TFLite export, run with the standalone TFLite interpreter.
+
+    The interpreter has a fixed batch dimension and resizing it reallocates
+    every tensor, so each batch size keeps its own interpreter instead.
+    Sizes up to EXACT_BATCH_SIZES run as they are; larger micro-batches are
+    padded to the next multiple of EXACT_BATCH_SIZES, which bounds the
+    number of interpreters (about 7 MB each) per process.
+    """
+
+    EXACT_BATCH_SIZES = 8
+
+    def __init__(self, path):
+        self.path = path
+        self._interpreters = {}   # padded batch size -> (interpreter, input index, output index)
+        self._interpreter(1)
+
+    def _interpreter(self, batch_size):
+        entry = self._interpreters.get(batch_size)
+        if entry is None:
+            interpreter = _tflite_interpreter(self.path)
+            input_index = interpreter.get_input_details()[0]['index']
+            output_index = interpreter.get_output_details()[0]['index']
+            interpreter.resize_tensor_input(input_index, (batch_size, INPUT_SIZE, INPUT_SIZE, 1))
+            interpreter.allocate_tensors()
+            entry = self._interpreters[batch_size] = (interpreter, input_index, output_index)
+        return entry
+
+    def predict_batch(self, faces):
+        faces = np.ascontiguousarray(faces, dtype=np.float32)
+        count = len(faces)
+        step = self.EXACT_BATCH_SIZES
+        padded = count if count <= step else -(-count // step) * step
+        if padded != count:
+            faces = np.concatenate([faces, np.zeros((padded - count,) + faces.shape[1:], np.float32)])
+        interpreter, input_index, output_index = self._interpreter(padded)
+        interpreter.set_tensor(input_index, faces)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[:count]
+
+
+class OpenCVEmotionModel:
+    """ONNX export run by OpenCV's DNN module"""
+
+    def __init__(self, path):
+        self.net = cv2.dnn.readNetFromONNX(path)
+
+    def predict_batch(self, faces):
+        self.net.setInput(np.ascontiguousarray(faces, dtype=np.float32))
+        return self.net.forward().reshape(len(faces), -1)
+
+
+def load_emotion_model(path):
+    """Load a model file with the runtime matching its extension"""
+    if path.endswith('.onnx'):
+        return OpenCVEmotionModel(path)
+    if path.endswith('.tflite'):
+        return TFLiteEmotionModel(path)
+    return KerasEmotionModel(path)
+
+
+class MicroBatcher:
+    """Collect single inputs from concurrent callers into batched model calls.
+
+    Each ``submit`` returns a Future. A background thread takes the first
+    waiting input, keeps collecting for up to ``max_wait`` seconds or until
+    ``max_batch_size`` inputs are waiting, runs one forward pass for the
+    whole batch and resolves every caller's Future with its own row.
+    Framework overhead per call is paid once per batch instead of once per
+    face.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait=0.005):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='emotion-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def mean_batch_size(self):
+        return self.items / self.batches if self.batches else 0.0
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Callers that gave up (cancelled their Future) are dropped from the batch
+            batch = [(item, future) for item, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                outputs = self.predict_batch(np.stack(items))
+            except Exception as e:
+                logger.error(f"Batched emotion inference failed for {len(items)} faces: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
+
+
+class EmotionClassifier:
+    """Per-process emotion model behind a micro-batcher.
+
+    The model is loaded once per process on first use; every thread in the
+    process shares it through the batcher. If the model file or its
+    runtime is missing, ``available`` is False and callers fall back to the
+    heuristic labels.
+    """
+
+    def __init__(self, path=None, max_batch_size=32, max_wait=0.005):
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._pid = None
+        self._batcher = None
+        self.available = None
+        self.model_path = None
+        self.timed_out = 0
+
+    def candidate_paths(self):
+        if self.path:
+            return [self.path]
+        return [os.path.join(MODEL_DIR, name) for name in MODEL_CANDIDATES]
+
+    def load_model(self):
+        """First candidate model that exists and whose runtime is installed"""
+        errors = []
+        for path in self.candidate_paths():
+            if not os.path.exists(path):
+                continue
+            try:
+                model = load_emotion_model(path)
+                self.model_path = path
+                return model
+            except Exception as e:
+                errors.append(f"{os.path.basename(path)}: {e}")
+        raise FileNotFoundError('; '.join(errors) or 'no emotion model file found')
+
+    def _get_batcher(self):
+        # Threads and models do not survive fork(); rebuild in a child process
+        if self._pid == os.getpid():
+            return self._batcher
+        with self._lock:
+            if self._pid != os.getpid():
+                self._batcher = None
+                try:
+                    model = self.load_model()
+                    self._batcher = MicroBatcher(model.predict_batch, self.max_batch_size, self.max_wait)
+                    logger.info(f"Loaded emotion model {self.model_path}")
+                except Exception as e:
+                    logger.warning(f"Emotion model unavailable ({e}), using fallback labels")
+                self.available = self._batcher is not None
+                self._pid = os.getpid()
+        return self._batcher
+
+    def predict_proba_async(self, gray_face):
+        """Future resolving to the class probabilities of one grayscale face, or None"""
+        batcher = self._get_batcher()
+        if batcher is None:
+            return None
+        return batcher.submit(preprocess_face(gray_face))
+
+    def predict(self, gray_face, timeout=1.0):
+        """(label, probability) for one grayscale face crop.
+
+        None without a model, or if the batcher does not answer within
+        ``timeout``; the abandoned crop is then dropped from its batch.
+        """
+        future = self.predict_proba_async(gray_face)
+        if future is None:
+            return None
+        try:
+            probs = future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            self.timed_out += 1
+            logger.warning(f"Emotion model gave no answer within {timeout}s, using fallback label")
+            return None
+        index = int(np.argmax(probs))
+        return EMOTION_LABELS[index], float(probs[index])
+
+    def stats(self):
+        batcher = self._batcher
+        return {
+            'available': bool(self.available),
+            'model': os.path.basename(self.model_path) if self.model_path else None,
+            'batches': batcher.batches if batcher else 0,
+            'faces': batcher.items if batcher else 0,
+            'mean_batch_size': round(batcher.mean_batch_size(), 2) if batcher else 0.0,
+            'timed_out': self.timed_out,
+        }
+
+
+emotion_classifier = EmotionClassifier()
+
+_local = threading.local()
+
+
+def _face_cascade():
+    # CascadeClassifier is not thread-safe, so each request thread keeps its own
+    cascade = getattr(_local, 'face_cascade', None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        _local.face_cascade = cascade
+    return cascade
+
+
 def predict_emotion(frame):
-	# TODO: Replace with your real model logic
-	# Example: Always returns face found, concentrated, and 'focused'
-	# You should use your ML model to analyze the frame and return these values
-	emotion_label = 'focused'
-	is_concentrated = True
-	face_found = True if frame is not None else False
-	return emotion_label, is_concentrated, face_found
+    """Return (emotion_label, is_concentrated, face_found) for a BGR frame"""
+    if frame is None:
+        return FALLBACK_EMOTION, True, False
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = _face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(48, 48))
+    if len(faces) == 0:
+        return 'No Face', False, False
+
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    prediction = emotion_classifier.predict(gray[y:y+h, x:x+w])
+    if prediction is None:
+        return FALLBACK_EMOTION, True, True
+    emotion_label, _ = prediction
+    return emotion_label, emotion_concentration_map.get(emotion_label, True), True
@@ -0,0 +1,120 @@
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import request
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Set SQL_PROFILE=1 to profile every request: X-SQL-Queries / X-SQL-Time-Ms
+# response headers, one summary log line per request, and a warning for any
+# statement shape run more than SQL_PROFILE_MAX_REPEATS times (likely N+1).
+ENABLED = os.environ.get('SQL_PROFILE', '') not in ('', '0')
+MAX_REPEATS = int(os.environ.get('SQL_PROFILE_MAX_REPEATS', 5))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_local = threading.local()
+_observer_lock = threading.Lock()
+_observer_added = False
+
+
+def statement_shape(sql):
+    """SQL with literals and placeholder lists folded to ``?``.
+
+    The same query issued in a loop maps to one shape whatever its
+    arguments, whether they were bound or formatted into the string.
+    """
+    shape = _LITERALS.sub('?', sql)
+    shape = _PLACEHOLDER_LISTS.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryProfile:
+    """Statements run on one thread while the profile is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, sql, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(sql)] += 1
+
+    def repeated(self, max_repeats=MAX_REPEATS):
+        """[(shape, count)] for shapes run more than ``max_repeats`` times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > max_repeats]
+
+    def summary(self):
+        return {
+            'queries': self.count,
+            'sql_ms': round(self.seconds * 1000, 2),
+            'distinct_statements': len(self.shapes),
+            'repeated': self.repeated(),
+        }
+
+
+def _record(sql, seconds):
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.record(sql, seconds)
+
+
+def _add_observer():
+    global _observer_added
+    with _observer_lock:
+        if not _observer_added:
+            db.add_query_observer(_record)
+            _observer_added = True
+
+
+@contextmanager
+def profile():
+    """Collect the statements run on this thread inside the block"""
+    _add_observer()
+    previous = getattr(_local, 'profile', None)
+    current = _local.profile = QueryProfile()
+    try:
+        yield current
+    finally:
+        _local.profile = previous
+
+
+def install(app, max_repeats=MAX_REPEATS):
+    """Profile every request of ``app`` when SQL_PROFILE is set"""
+    if not ENABLED:
+        return
+    _add_observer()
+
+    @app.before_request
+    def start_sql_profile():
+        _local.profile = QueryProfile()
+
+    @app.after_request
+    def report_sql_profile(response):
+        current = getattr(_local, 'profile', None)
+        if current is None:
+            return response
+        response.headers['X-SQL-Queries'] = str(current.count)
+        response.headers['X-SQL-Time-Ms'] = f"{current.seconds * 1000:.2f}"
+        route = request.url_rule.rule if request.url_rule else request.path
+        logger.info(f"SQL {request.method} {route}: {current.count} queries, "
+                    f"{current.seconds * 1000:.2f} ms, {len(current.shapes)} distinct")
+        for shape, count in current.repeated(max_repeats):
+            logger.warning(f"Possible N+1 in {request.method} {route}: {count}x {shape}")
+        return response
+
+    @app.teardown_request
+    def stop_sql_profile(_error):
+        _local.profile = None
+
+    logger.info(f"SQL profiling enabled (warn above {max_repeats} repeats)")
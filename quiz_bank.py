@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUIZ_DIR = os.path.join(os.path.dirname(__file__), 'data', 'quiz_questions')
+QUIZ_LEVELS = ('basic', 'intermediate', 'advanced')
+
+
+def _build_course(filename, data):
+    """Index a parsed quiz file by level and topic"""
+    questions = data.get('questions', [])
+    by_level = {}
+    by_topic = {}
+    for question in questions:
+        level = question.get('level')
+        by_level.setdefault(level, []).append(question)
+        topic_id = question.get('topic_id')
+        if topic_id is not None:
+            by_topic.setdefault((level, topic_id), []).append(question)
+            by_topic.setdefault((None, topic_id), []).append(question)
+
+    return {
+        'course_id': data.get('course_id'),
+        'course_title': data.get('course_title', 'Unknown Course'),
+        'language': data.get('language', ''),
+        'filename': filename,
+        'slug': filename[:-len('.json')],
+        'questions': questions,
+        'by_level': by_level,
+        'by_topic': by_topic,
+        'level_counts': {level: len(items) for level, items in by_level.items() if level},
+        'levels': sorted(level for level in by_level if level),
+        'total_questions': len(questions),
+    }
+
+
+class QuizBank:
+    """In-memory index of data/quiz_questions keyed by course, level and topic.
+
+    Files are parsed once and re-parsed only when their mtime changes. The
+    directory is re-stat'ed at most every ``check_interval`` seconds so a hot
+    endpoint costs a dict lookup rather than a directory scan.
+    """
+
+    def __init__(self, quiz_dir=QUIZ_DIR, check_interval=2.0):
+        self.quiz_dir = quiz_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._files = {}  # filename -> (mtime_ns, course entry or None)
+        self._courses = []
+        self._by_id = {}
+        self._by_slug = {}
+        self._last_check = 0.0
+
+    def refresh(self, force=False):
+        """Reload changed quiz files; returns True if the index was rebuilt"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            if not force and now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+
+            try:
+                entries = {
+                    entry.name: entry.stat().st_mtime_ns
+                    for entry in os.scandir(self.quiz_dir)
+                    if entry.name.endswith('.json') and entry.is_file()
+                }
+            except FileNotFoundError:
+                logger.warning(f"Quiz directory {self.quiz_dir} not found!")
+                entries = {}
+
+            changed = set(self._files) - set(entries)
+            files = {name: self._files[name] for name in entries if name in self._files}
+            for filename, mtime in entries.items():
+                cached = self._files.get(filename)
+                if cached and cached[0] == mtime:
+                    continue
+                files[filename] = (mtime, self._load_file(filename))
+                changed.add(filename)
+
+            if not changed:
+                return False
+
+            self._files = files
+            self._rebuild()
+            return True
+
+    def _load_file(self, filename):
+        path = os.path.join(self.quiz_dir, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content:
+                logger.warning(f"Empty quiz file {filename}")
+                return None
+            course = _build_course(filename, json.loads(content))
+            logger.info(f"Indexed quiz file {filename} ({course['total_questions']} questions)")
+            return course
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading quiz file {filename}: {e}")
+            return None
+
+    def _rebuild(self):
+        courses = sorted((course for _, course in self._files.values() if course), key=lambda course: course['filename'])
+        by_id = {}
+        for course in courses:
+            key = str(course['course_id'])
+            if key in by_id:
+                logger.warning(f"Duplicate quiz course_id {key} in {course['filename']}, keeping {by_id[key]['filename']}")
+                continue
+            by_id[key] = course
+        # Swap whole references so readers never see a half-built index
+        self._courses = courses
+        self._by_id = by_id
+        self._by_slug = {course['slug']: course for course in courses}
+
+    def courses(self):
+        """All indexed quiz courses, ordered by filename"""
+        self.refresh()
+        return self._courses
+
+    def get_course(self, course_id):
+        self.refresh()
+        return self._by_id.get(str(course_id))
+
+    def get_course_by_slug(self, slug):
+        self.refresh()
+        return self._by_slug.get(slug)
+
+    def questions(self, course_id, level=None, topic_id=None):
+        """Questions for a course, optionally narrowed to a level and topic"""
+        course = self.get_course(course_id)
+        if not course:
+            return []
+        if topic_id is not None:
+            return course['by_topic'].get((level, topic_id), [])
+        if level is None:
+            return course['questions']
+        return course['by_level'].get(level, [])
+
+    def level_counts(self, course_id):
+        course = self.get_course(course_id)
+        return course['level_counts'] if course else {}
+
+    def languages(self):
+        """Lower-cased languages covered by at least one quiz file"""
+        return {course['language'].lower() for course in self.courses() if course['language']}
+
+
+quiz_bank = QuizBank()
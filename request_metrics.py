@@ -0,0 +1,123 @@
+import logging
+import os
+import time
+
+from flask import Response, g, request
+
+import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Latency buckets in seconds. Pages render in tens of milliseconds; webcam
+# frames can take up to the 2 s inference timeout.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# Statement kinds used as the query label; anything else is reported as 'other'
+QUERY_KINDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'PRAGMA', 'CREATE', 'BEGIN')
+
+
+def _query_kind(sql):
+    words = sql.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ''
+    return kind if kind in QUERY_KINDS else 'other'
+
+
+class RequestMetrics:
+    """Prometheus metrics for the Flask app, served at /metrics.
+
+    Tracks per-route request counts, latency histograms and in-flight
+    gauges, SQL statement counts and durations, and the depth of the
+    inference and emotion-ingest queues. Routes are labelled with their
+    URL rule (``/topic/<topic_id>``), never the raw path, to keep label
+    cardinality bounded.
+
+    Under a multi-process WSGI server, set PROMETHEUS_MULTIPROC_DIR to an
+    empty directory before the workers start. Each process then writes its
+    samples there and /metrics sums them across processes, whichever worker
+    serves the scrape. The server should call
+    ``prometheus_client.multiprocess.mark_process_dead(pid)`` when a worker
+    exits (gunicorn: the ``child_exit`` hook).
+
+    Without prometheus_client installed, ``available`` is False and nothing
+    is registered.
+    """
+
+    def __init__(self):
+        self.available = prometheus_client is not None
+        if not self.available:
+            return
+        self.multiprocess = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+        self.requests = Counter('http_requests_total', 'HTTP requests handled',
+                                ['method', 'route', 'status'])
+        self.latency = Histogram('http_request_duration_seconds', 'Time to produce the response',
+                                 ['method', 'route'], buckets=REQUEST_BUCKETS)
+        self.in_flight = Gauge('http_requests_in_flight', 'Requests currently being handled',
+                               ['route'], multiprocess_mode='livesum')
+        self.queries = Counter('db_queries_total', 'SQL statements executed', ['statement'])
+        self.query_latency = Histogram('db_query_duration_seconds', 'Time to execute a SQL statement',
+                                       ['statement'], buckets=QUERY_BUCKETS)
+        self.inference_pending = Gauge('emotion_inference_pending', 'Webcam frames in the inference pool',
+                                       multiprocess_mode='livesum')
+        self.ingest_depth = Gauge('emotion_ingest_queue_depth', 'Emotion samples waiting to be written',
+                                  multiprocess_mode='livesum')
+
+    def observe_query(self, sql, seconds):
+        kind = _query_kind(sql)
+        self.queries.labels(kind).inc()
+        self.query_latency.labels(kind).observe(seconds)
+
+    def install(self, app, queue_depths):
+        """Hook request timing into ``app`` and add the /metrics route.
+
+        ``queue_depths`` returns ``(inference pending, ingest depth)``; it is
+        sampled after every request so each process reports its own queues.
+        """
+        if not self.available:
+            logger.info("prometheus_client not available, /metrics disabled")
+            return
+
+        db.add_query_observer(self.observe_query)
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+            g.metrics_start = time.perf_counter()
+            self.in_flight.labels(g.metrics_route).inc()
+
+        @app.after_request
+        def record_request(response):
+            route = g.get('metrics_route')
+            if route is not None:
+                self.requests.labels(request.method, route, response.status_code).inc()
+                self.latency.labels(request.method, route).observe(time.perf_counter() - g.metrics_start)
+                pending, ingest_depth = queue_depths()
+                self.inference_pending.set(pending)
+                self.ingest_depth.set(ingest_depth)
+            return response
+
+        @app.teardown_request
+        def finish_request(_error):
+            route = g.pop('metrics_route', None)
+            if route is not None:
+                self.in_flight.labels(route).dec()
+
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    def render(self):
+        if self.multiprocess:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return Response(prometheus_client.generate_latest(registry),
+                        content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+request_metrics = RequestMetrics()
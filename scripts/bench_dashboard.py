@@ -0,0 +1,121 @@
+"""Measure /dashboard latency against synthetic catalogs of different sizes.
+
+For each catalog size a scratch quiz directory and database are generated,
+with progress recorded for every other course, and the dashboard is
+rendered through Flask's test client.
+
+    python scripts/bench_dashboard.py [--sizes 10 100 1000] [--requests 50] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+BENCH_USER_ID = 1
+TOPICS_PER_COURSE = 5
+
+
+def write_catalog(quiz_dir, size):
+    """Write ``size`` quiz files with one question per level"""
+    for course_id in range(1, size + 1):
+        questions = [
+            {'id': i, 'level': level, 'question': f'Question {i}', 'options': ['a', 'b', 'c', 'd'],
+             'correct_answer': 0, 'explanation': ''}
+            for i, level in enumerate(('basic', 'intermediate', 'advanced'), start=1)
+        ]
+        data = {'course_id': course_id, 'course_title': f'Course {course_id}', 'language': 'python',
+                'questions': questions}
+        with open(os.path.join(quiz_dir, f'course_{course_id:05d}.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+
+def seed_progress(size):
+    rows = [
+        (BENCH_USER_ID, course_id, f'{course_id}_{topic}', 'in_progress', 20.0 * topic)
+        for course_id in range(1, size + 1, 2)
+        for topic in range(TOPICS_PER_COURSE)
+    ]
+    with db.db_connection() as connection:
+        connection.executemany(
+            'INSERT INTO course_progress (user_id, course_id, topic_id, status, progress_percentage) '
+            'VALUES (?, ?, ?, ?, ?)',
+            rows,
+        )
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_size(app_module, size, requests):
+    workdir = tempfile.mkdtemp(prefix=f'dashboard_{size}_')
+    quiz_dir = os.path.join(workdir, 'quiz_questions')
+    os.makedirs(quiz_dir)
+    write_catalog(quiz_dir, size)
+
+    db.close_thread_connection()
+    db.DB_PATH = os.path.join(workdir, 'bench.db')
+    db.init_db()
+    seed_progress(size)
+
+    bank = app_module.quiz_bank
+    bank.quiz_dir = quiz_dir
+    bank.refresh(force=True)
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = BENCH_USER_ID
+        sess['username'] = 'bench'
+
+    # Warm the template cache and the connection before timing
+    client.get('/dashboard')
+
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get('/dashboard')
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'/dashboard returned {response.status_code} at {size} courses')
+
+    return {
+        'courses': size,
+        'requests': requests,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'max_ms': round(max(samples), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    # Point init_db() at a scratch database before app.py runs it on import
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), 'import.db')
+    import app as app_module
+
+    results = [bench_size(app_module, size, args.requests) for size in args.sizes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'courses':>8} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for result in results:
+        print(f"{result['courses']:>8} {result['p50_ms']:>10} {result['p95_ms']:>10} {result['max_ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
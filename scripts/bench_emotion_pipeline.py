@@ -0,0 +1,246 @@
+"""Time every stage of the webcam emotion pipeline over a corpus of frames.
+
+Frames come from two corpora, each encoded as JPEG at every --widths:
+  * synthetic -- a background with 0, 1, 2 or 4 copies of the --face image
+                 pasted in a grid (only faceless frames without --face)
+  * recorded  -- every image file in --frames, e.g. saved webcam captures
+and are replayed through the stages the endpoints run:
+
+  base64_decode    data URL -> bytes (legacy JSON uploads)
+  imdecode         JPEG -> BGR frame
+  grayscale        full-frame BGR -> gray (what predict_emotion starts with)
+  downscale        resize to DETECTION_WIDTH and convert to gray
+  haar_face        frontal-face cascade on the downscaled frame
+  haar_eye_smile   eye and smile cascades on every face crop
+  mediapipe        MediaPipe face detection (when installed)
+  analyze_frame    face_analysis.analyze_image_bytes, the /api/emotion worker job
+  predict_emotion  ml_models.predict_emotion, the /api/emotion_detect path
+
+For each corpus/width/face-count group the report gives per-stage latency
+percentiles, end-to-end frames per core-second (OpenCV is pinned to
+--threads threads, 1 by default) and the process's peak RSS so far. Use
+--json and diff the output between releases.
+
+    python scripts/bench_emotion_pipeline.py [--face face.jpg] [--frames dir]
+        [--widths 320 640 1280] [--repeats 20] [--json]
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+import face_analysis
+
+FACE_COUNTS = (0, 1, 2, 4)
+STAGES = ('base64_decode', 'imdecode', 'grayscale', 'downscale', 'haar_face', 'haar_eye_smile',
+          'mediapipe', 'analyze_frame', 'predict_emotion')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def synthetic_frame(width, face, count, rng):
+    """4:3 frame with ``count`` copies of ``face`` on a noisy gradient"""
+    height = width * 3 // 4
+    gradient = np.linspace(60, 190, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    frame = np.clip(gradient + rng.normal(0, 12, (height, width, 3)), 0, 255).astype(np.uint8)
+    if count == 0:
+        return frame
+    columns = 1 if count == 1 else 2
+    rows = (count + columns - 1) // columns
+    cell_w, cell_h = width // columns, height // rows
+    side = int(min(cell_w, cell_h) * 0.8)
+    patch = cv2.resize(face, (side, side), interpolation=cv2.INTER_AREA)
+    for i in range(count):
+        x = (i % columns) * cell_w + (cell_w - side) // 2
+        y = (i // columns) * cell_h + (cell_h - side) // 2
+        frame[y:y + side, x:x + side] = patch
+    return frame
+
+
+def load_face(path):
+    """Square crop around the largest face in ``path``, or the whole image"""
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise SystemExit(f"Cannot read face image {path}")
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = face_analysis.get_detectors().face_cascade.detectMultiScale(gray, 1.1, 5)
+    if len(faces) == 0:
+        return image
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    # Keep some forehead and chin so the face is still found once pasted
+    pad = w // 2
+    y0, x0 = max(0, y - pad), max(0, x - pad)
+    return image[y0:y + h + pad, x0:x + w + pad]
+
+
+def resize_to_width(image, width):
+    height = round(image.shape[0] * width / image.shape[1])
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def build_corpus(args):
+    """[(corpus, width, faces, [frame, ...])] with faces None for recorded frames"""
+    rng = np.random.default_rng(0)
+    groups = []
+    face = load_face(args.face) if args.face else None
+    if face is None and not args.frames:
+        print("No --face image: synthetic frames will have no faces", file=sys.stderr)
+    for width in args.widths:
+        for count in FACE_COUNTS if face is not None else (0,):
+            frames = [synthetic_frame(width, face, count, rng) for _ in range(args.variants)]
+            groups.append(('synthetic', width, count, frames))
+    if args.frames:
+        images = [cv2.imread(os.path.join(args.frames, name), cv2.IMREAD_COLOR)
+                  for name in sorted(os.listdir(args.frames))]
+        images = [image for image in images if image is not None]
+        if not images:
+            raise SystemExit(f"No readable images in {args.frames}")
+        for width in args.widths:
+            groups.append(('recorded', width, None, [resize_to_width(image, width) for image in images]))
+    return groups
+
+
+def timed(samples, stage, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    samples[stage].append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def run_stages(jpeg, samples, detectors, predict_emotion):
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+    timed(samples, 'base64_decode', lambda: base64.b64decode(data_url.split(',', 1)[1]))
+
+    frame = timed(samples, 'imdecode', face_analysis.decode_frame, jpeg)
+    frame_h, frame_w = frame.shape[:2]
+    timed(samples, 'grayscale', cv2.cvtColor, frame, cv2.COLOR_BGR2GRAY)
+
+    scale = min(1.0, face_analysis.DETECTION_WIDTH / frame_w)
+
+    def downscale():
+        small = cv2.resize(frame, (round(frame_w * scale), round(frame_h * scale)),
+                           interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+        return small, cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    small, small_gray = timed(samples, 'downscale', downscale)
+
+    size_scale = scale * frame_w / face_analysis.FACE_SIZE_REFERENCE_WIDTH
+    faces = timed(samples, 'haar_face', face_analysis.detect_haar_faces, small_gray, size_scale, detectors)
+
+    def eye_smile():
+        for x, y, w, h in (np.asarray(faces).reshape(-1, 4) / scale).astype(int):
+            roi = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+            face_analysis.detect_face_features(roi, detectors)
+    timed(samples, 'haar_eye_smile', eye_smile)
+
+    if detectors.face_detection is not None:
+        timed(samples, 'mediapipe', face_analysis.detect_mediapipe_faces, small, frame_w, frame_h, detectors)
+
+    result, _ = timed(samples, 'analyze_frame', face_analysis.analyze_image_bytes, jpeg)
+    timed(samples, 'predict_emotion', predict_emotion, frame)
+    return result['face_count']
+
+
+def bench_group(corpus, width, faces, frames, args, detectors, predict_emotion):
+    jpegs = [cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes()
+             for frame in frames]
+    for jpeg in jpegs:
+        # Warm-up: first calls allocate cascade buffers
+        run_stages(jpeg, {stage: [] for stage in STAGES}, detectors, predict_emotion)
+
+    samples = {stage: [] for stage in STAGES}
+    found = []
+    cpu_start = time.process_time()
+    for _ in range(args.repeats):
+        for jpeg in jpegs:
+            found.append(run_stages(jpeg, samples, detectors, predict_emotion))
+    cpu_seconds = time.process_time() - cpu_start
+
+    analyze_ms = sum(samples['analyze_frame'])
+    total_ms = sum(sum(values) for values in samples.values())
+    height = frames[0].shape[0]
+    return {
+        'corpus': corpus,
+        'width': width,
+        'height': height,
+        'faces': faces,
+        'faces_found': round(statistics.mean(found), 2),
+        'jpeg_kb': round(statistics.mean(len(jpeg) for jpeg in jpegs) / 1024, 1),
+        'frames': len(samples['analyze_frame']),
+        'stages': {
+            stage: {
+                'p50_ms': round(percentile(values, 50), 3),
+                'p95_ms': round(percentile(values, 95), 3),
+                'p99_ms': round(percentile(values, 99), 3),
+                'mean_ms': round(statistics.mean(values), 3),
+            }
+            for stage, values in samples.items() if values
+        },
+        # analyze_frame is the per-frame work of one inference worker; its
+        # share of the CPU time converts wall-clock rate into per-core rate
+        'frames_per_core_second': round(len(samples['analyze_frame']) /
+                                        max(1e-9, cpu_seconds * analyze_ms / total_ms), 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--face', help='image containing a face, pasted into the synthetic frames')
+    parser.add_argument('--frames', help='directory of recorded frames')
+    parser.add_argument('--widths', type=int, nargs='+', default=[320, 640, 1280])
+    parser.add_argument('--variants', type=int, default=3, help='synthetic frames per group')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--quality', type=int, default=80, help='JPEG quality of the corpus')
+    parser.add_argument('--threads', type=int, default=1, help='OpenCV threads (0 = OpenCV default)')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+    detectors = face_analysis.get_detectors()
+    from ml_models import emotion_classifier, predict_emotion
+
+    results = [bench_group(*group, args, detectors, predict_emotion) for group in build_corpus(args)]
+    report = {
+        'opencv': cv2.__version__,
+        'threads': args.threads,
+        'mediapipe': detectors.face_detection is not None,
+        'classifier': emotion_classifier.stats(),
+        'peak_rss_mb': peak_rss_mb(),
+        'groups': results,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for r in results:
+        faces = 'rec' if r['faces'] is None else r['faces']
+        print(f"\n{r['corpus']} {r['width']}x{r['height']} faces={faces} (found {r['faces_found']}, "
+              f"{r['jpeg_kb']} KB): {r['frames_per_core_second']} frames/core-s, peak RSS {r['peak_rss_mb']} MB")
+        print(f"  {'stage':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, s in r['stages'].items():
+            print(f"  {stage:<16} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+    print(f"\nOpenCV {report['opencv']}, {args.threads or 'default'} thread(s), "
+          f"MediaPipe {'on' if report['mediapipe'] else 'off'}, model {report['classifier']['model']}")
+
+
+if __name__ == '__main__':
+    main()
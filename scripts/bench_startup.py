@@ -0,0 +1,77 @@
+"""Check how long `import app` takes and that it does not load the CV stack.
+
+Each run imports the app in a fresh interpreter against a scratch database
+(the first run also applies migrations, so it is reported but not counted)
+and records the wall time and which heavy modules ended up in sys.modules.
+Exits non-zero if the median exceeds --budget-ms or any heavy module was
+imported.
+
+    python scripts/bench_startup.py [--runs 5] [--budget-ms 1000] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only the webcam routes and inference workers should load
+HEAVY_MODULES = ('cv2', 'numpy', 'mediapipe', 'dlib', 'tensorflow', 'torch')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import db
+db.DB_PATH = sys.argv[1]
+import app
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({'ms': elapsed, 'heavy': [m for m in %r if m in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+
+def import_once(db_path):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, db_path],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'startup.db')
+    first = import_once(db_path)
+    runs = [import_once(db_path) for _ in range(args.runs)]
+    timings = [run['ms'] for run in runs]
+    heavy = sorted({module for run in [first] + runs for module in run['heavy']})
+
+    result = {
+        'first_import_ms': round(first['ms'], 1),
+        'median_ms': round(statistics.median(timings), 1),
+        'max_ms': round(max(timings), 1),
+        'budget_ms': args.budget_ms,
+        'heavy_modules': heavy,
+    }
+    result['ok'] = result['median_ms'] <= args.budget_ms and not heavy
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"first import (with migrations): {result['first_import_ms']} ms")
+        print(f"median over {args.runs} runs:   {result['median_ms']} ms (max {result['max_ms']}, "
+              f"budget {args.budget_ms:g})")
+        print(f"heavy modules imported:          {', '.join(heavy) or 'none'}")
+        print('ok' if result['ok'] else 'FAIL')
+    return 0 if result['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Count the SQL statements behind the main pages and flag N+1 patterns.
+
+Requests each route through Flask's test client as a logged-in user with
+progress in a few courses (scratch database, real quiz bank and career
+data) and reports the statements, SQL time and most repeated statement
+shape per request. Exits non-zero if a route runs more than --max-queries
+statements or repeats one shape more than --max-repeats times, so a
+query-count regression fails the check instead of waiting for a review.
+
+    python scripts/check_query_counts.py [--max-queries 25] [--max-repeats 5] [--json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import query_profiler
+
+PROGRESS_COURSES = 3
+TOPICS_PER_COURSE = 5
+
+
+def seed_user(course_ids):
+    user_id = db.create_user('query-check', 'query-check')
+    rows = [
+        (user_id, course_id, f'{course_id}_{topic}', 'in_progress', 20.0 * topic)
+        for course_id in course_ids
+        for topic in range(TOPICS_PER_COURSE)
+    ]
+    with db.db_connection() as connection:
+        connection.executemany(
+            'INSERT INTO course_progress (user_id, course_id, topic_id, status, progress_percentage) '
+            'VALUES (?, ?, ?, ?, ?)',
+            rows,
+        )
+    return user_id
+
+
+def routes(course_id, career_id):
+    paths = ['/dashboard', '/api/user/progress', '/api/available_courses', '/api/user_courses',
+             '/api/quiz/available-courses', '/api/career-recommendations']
+    if course_id is not None:
+        paths += [f'/course/{course_id}/modules', f'/api/course/{course_id}/structure',
+                  f'/api/course/{course_id}/next-topic', f'/continue-course/{course_id}']
+    if career_id is not None:
+        paths.append(f'/api/career-recommendations/{career_id}')
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-queries', type=int, default=25)
+    parser.add_argument('--max-repeats', type=int, default=query_profiler.MAX_REPEATS)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    # Route debug prints go to stdout; keep it clean for --json
+    with contextlib.redirect_stdout(sys.stderr):
+        # Point init_db() at a scratch database before app.py runs it on import
+        db.DB_PATH = os.path.join(tempfile.mkdtemp(), 'query_check.db')
+        import app as app_module
+
+        course_ids = [course['course_id'] for course in app_module.quiz_bank.courses() if course['course_id']]
+        user_id = seed_user(course_ids[:PROGRESS_COURSES])
+        with open(os.path.join(app_module.app.root_path, 'career_recommendations.json'), encoding='utf-8') as f:
+            careers = json.load(f).get('careers', [])
+
+        client = app_module.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['username'] = 'query-check'
+
+        results = []
+        for path in routes(course_ids[0] if course_ids else None, careers[0]['id'] if careers else None):
+            with query_profiler.profile() as profile:
+                status = client.get(path).status_code
+            repeated = profile.shapes.most_common(1)
+            shape, repeats = repeated[0] if repeated else ('', 0)
+            results.append({
+                'path': path,
+                'status': status,
+                'queries': profile.count,
+                'sql_ms': round(profile.seconds * 1000, 2),
+                'max_repeats': repeats,
+                'most_repeated': shape,
+                'ok': profile.count <= args.max_queries and repeats <= args.max_repeats,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'path':<40} {'status':>6} {'queries':>8} {'SQL ms':>8} {'repeats':>8}")
+        for r in results:
+            print(f"{r['path']:<40} {r['status']:>6} {r['queries']:>8} {r['sql_ms']:>8} {r['max_repeats']:>8}"
+                  + ('' if r['ok'] else f"  FAIL: {r['most_repeated'][:80]}"))
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Fail if any hot query falls back to a full table scan.
+
+Builds a scratch database with init_db() (or checks an existing one passed
+as the first argument), runs EXPLAIN QUERY PLAN for each query below and
+exits non-zero when a plan contains a SCAN that does not use an index.
+
+    python scripts/check_query_plans.py [path/to/app.db]
+"""
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+# (name, sql, params) -- keep in sync with the queries in db.py and app.py
+HOT_QUERIES = [
+    ('get_recent_emotions',
+     'SELECT emotion, timestamp FROM emotions WHERE user_id = ? ORDER BY id DESC LIMIT ?',
+     (1, 50)),
+    ('get_student_data: last emotion',
+     'SELECT emotion FROM emotions WHERE user_id = ? ORDER BY id DESC LIMIT 1',
+     (1,)),
+    ('get_emotion_analytics',
+     'SELECT emotion, timestamp, course_id, topic_id FROM emotions WHERE user_id = ? '
+     'AND timestamp_epoch >= ? AND course_id = ? ORDER BY timestamp_epoch DESC',
+     (1, 0, 1)),
+    ('get_emotion_buckets',
+     'SELECT bucket_start, emotion, SUM(sample_count) AS sample_count FROM emotion_rollups '
+     'WHERE user_id = ? AND bucket_start >= ? AND course_id = ? GROUP BY bucket_start, emotion '
+     'ORDER BY bucket_start ASC',
+     (1, 0, 1)),
+    ('get_recent_emotion_buckets',
+     'SELECT bucket_start, emotion, sample_count FROM emotion_rollups '
+     'WHERE user_id = ? ORDER BY bucket_start DESC',
+     (1,)),
+    ('get_student_data: courses started',
+     'SELECT COUNT(*) AS cnt FROM progress WHERE user_id = ?',
+     (1,)),
+    ('get_student_data: average score',
+     'SELECT AVG(score) AS avg_score FROM quiz_results WHERE user_id = ?',
+     (1,)),
+    ('results',
+     'SELECT quiz_title, score, total, language, difficulty, submitted_at FROM quiz_results '
+     'WHERE user_id = ? ORDER BY submitted_at DESC LIMIT 20',
+     (1,)),
+    ('view_topic: exercise progress',
+     'SELECT status, score, completion_time FROM sub_exercise_progress WHERE user_id = ? AND sub_exercise_id = ?',
+     (1, 1)),
+    ('completed exercise count',
+     "SELECT COUNT(*) as completed FROM sub_exercise_progress "
+     "WHERE user_id = ? AND course_id = ? AND topic_id = ? AND status = 'completed'",
+     (1, 1, '1_0_0')),
+    ('get_sub_exercise_progress',
+     'SELECT se.*, sep.status FROM sub_exercises se '
+     'LEFT JOIN sub_exercise_progress sep ON se.id = sep.sub_exercise_id '
+     'AND sep.user_id = ? AND sep.course_id = ? AND sep.topic_id = ? '
+     'WHERE se.course_id = ? AND se.topic_id = ? ORDER BY se.sub_exercise_index ASC',
+     (1, 1, '1_0_0', 1, '1_0_0')),
+    ('get_course_progress_summary',
+     'SELECT course_id, COUNT(*) AS progress_count, AVG(progress_percentage) AS avg_progress '
+     'FROM course_progress WHERE user_id = ? GROUP BY course_id',
+     (1,)),
+    ('load_course_modules: modules',
+     'SELECT m.id, m.title, m.description, m.module_order, mp.status, mp.score FROM modules m '
+     'LEFT JOIN module_progress mp ON mp.module_id = m.id AND mp.user_id = ? '
+     'WHERE m.course_id = ? ORDER BY m.module_order',
+     (1, 1)),
+    ('load_course_modules: submodules',
+     'SELECT s.module_id, s.id, s.title, s.description, s.content, s.submodule_order FROM submodules s '
+     'JOIN modules m ON m.id = s.module_id WHERE m.course_id = ? ORDER BY s.module_id, s.submodule_order',
+     (1,)),
+    ('load_course_structure',
+     'SELECT topic_id, id, title, description, exercise_type, difficulty, estimated_time, sub_exercise_index '
+     'FROM sub_exercises WHERE course_id = ? ORDER BY topic_id, sub_exercise_index',
+     (1,)),
+    ('get_user_by_email',
+     'SELECT * FROM users WHERE email = ?',
+     ('admin@example.com',)),
+    ('get_user_courses',
+     'SELECT course_id FROM user_courses WHERE user_id = ?',
+     (1,)),
+]
+
+
+def full_scans(connection, sql, params):
+    """Return the plan steps that scan a table without an index"""
+    plan = connection.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    return [row[3] for row in plan if row[3].startswith('SCAN') and 'INDEX' not in row[3]]
+
+
+def main():
+    if len(sys.argv) > 1:
+        db.DB_PATH = sys.argv[1]
+    else:
+        db.DB_PATH = os.path.join(tempfile.mkdtemp(), 'plan_check.db')
+        db.init_db()
+
+    failures = 0
+    with db.db_connection() as connection:
+        for name, sql, params in HOT_QUERIES:
+            scans = full_scans(connection, sql, params)
+            if scans:
+                failures += 1
+                print(f"FAIL {name}: {'; '.join(scans)}")
+            else:
+                print(f"ok   {name}")
+
+    print(f"{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
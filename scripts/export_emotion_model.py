@@ -0,0 +1,188 @@
+"""Export the trained emotion CNN to compact CPU formats and check them.
+
+Converts emotion_model.h5 to
+  * emotion_model_fp16.tflite  -- float16 weights
+  * emotion_model_int8.tflite  -- int8 weights and activations (float I/O)
+  * emotion_model.onnx         -- for OpenCV's DNN module (needs tf2onnx)
+then compares every export against the Keras model on the same inputs
+(top-1 agreement and largest probability difference) and times each
+runtime at batch size 1 and 32. An export that falls below
+--min-agreement is deleted rather than left where ml_models would load
+it, and the script exits non-zero; so does a format whose conversion
+fails, after the remaining formats have been exported.
+
+Calibration and parity inputs are 48x48 grayscale face crops read from
+--faces (any image files); without it random inputs are used, which is
+enough to catch conversion bugs but not to judge int8 accuracy.
+
+    python scripts/export_emotion_model.py [--model emotion_model.h5] [--faces dir] [--json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+import ml_models
+
+FORMATS = ('fp16', 'int8', 'onnx')
+OUTPUT_NAMES = {
+    'fp16': 'emotion_model_fp16.tflite',
+    'int8': 'emotion_model_int8.tflite',
+    'onnx': 'emotion_model.onnx',
+}
+
+
+def load_samples(faces_dir, count):
+    """Preprocessed face crops from ``faces_dir``, or uniform noise"""
+    if faces_dir:
+        samples = []
+        for name in sorted(os.listdir(faces_dir)):
+            image = cv2.imread(os.path.join(faces_dir, name), cv2.IMREAD_GRAYSCALE)
+            if image is not None:
+                samples.append(ml_models.preprocess_face(image))
+            if len(samples) == count:
+                break
+        if samples:
+            return np.stack(samples)
+        print(f"No readable images in {faces_dir}, using random inputs")
+    rng = np.random.default_rng(0)
+    return rng.random((count, ml_models.INPUT_SIZE, ml_models.INPUT_SIZE, 1), dtype=np.float32)
+
+
+def export_tflite(model, path, mode, calibration):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis]]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, path):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, ml_models.INPUT_SIZE, ml_models.INPUT_SIZE, 1), tf.float32, name='input'),)
+    # Tracing a tf.function works for both Keras 2 and Keras 3 models
+    forward = tf.function(lambda faces: model(faces, training=False), input_signature=spec)
+    tf2onnx.convert.from_function(forward, input_signature=spec, opset=13, output_path=path)
+
+
+def parity(reference, candidate):
+    agreement = float(np.mean(reference.argmax(axis=1) == candidate.argmax(axis=1)))
+    return agreement, float(np.abs(reference - candidate).max())
+
+
+def bench(predict_batch, samples, batch_size, repeats):
+    batch = samples[:batch_size]
+    if len(batch) < batch_size:
+        batch = np.resize(batch, (batch_size,) + batch.shape[1:])
+    predict_batch(batch)  # warm-up, also sizes the TFLite input tensor
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_batch(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=ml_models.MODEL_PATH)
+    parser.add_argument('--out-dir', default=ml_models.MODEL_DIR)
+    parser.add_argument('--faces', help='directory of face crops for calibration and parity')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--min-agreement', type=float, default=0.98)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    reference = ml_models.KerasEmotionModel(args.model)
+    samples = load_samples(args.faces, args.samples)
+    expected = reference.predict_batch(samples)
+
+    results = [{
+        'format': 'keras',
+        'path': args.model,
+        'size_kb': round(os.path.getsize(args.model) / 1024, 1),
+        'agreement': 1.0,
+        'max_abs_diff': 0.0,
+        'batch1_ms': bench(reference.predict_batch, samples, 1, args.repeats),
+        'batch32_ms': bench(reference.predict_batch, samples, 32, args.repeats),
+    }]
+    failures = 0
+    for fmt in args.formats:
+        path = os.path.join(args.out_dir, OUTPUT_NAMES[fmt])
+        # Serving code loads whatever sits at ``path``, so an export only
+        # gets there once it has passed the parity check
+        staging = os.path.join(args.out_dir, f'.export-{OUTPUT_NAMES[fmt]}')
+        ok = False
+        try:
+            # The converters chatter on stdout; keep it clean for --json
+            with contextlib.redirect_stdout(sys.stderr):
+                if fmt == 'onnx':
+                    export_onnx(reference.model, staging)
+                else:
+                    export_tflite(reference.model, staging, fmt, samples[:100])
+            exported = ml_models.load_emotion_model(staging)
+            agreement, max_diff = parity(expected, exported.predict_batch(samples))
+            ok = agreement >= args.min_agreement
+            result = {
+                'format': fmt,
+                'path': path if ok else None,
+                'size_kb': round(os.path.getsize(staging) / 1024, 1),
+                'agreement': round(agreement, 4),
+                'max_abs_diff': round(max_diff, 4),
+                'batch1_ms': bench(exported.predict_batch, samples, 1, args.repeats),
+                'batch32_ms': bench(exported.predict_batch, samples, 32, args.repeats),
+                'ok': ok,
+            }
+        except ImportError as e:
+            print(f"Skipping {fmt}: {e}")
+            continue
+        except Exception as e:
+            # Report the broken format and still export and check the others
+            ok = False
+            failures += 1
+            results.append({'format': fmt, 'path': None, 'error': f"{type(e).__name__}: {e}", 'ok': False})
+            continue
+        finally:
+            if not ok and os.path.exists(staging):
+                os.remove(staging)
+
+        if ok:
+            os.replace(staging, path)
+        failures += not ok
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'format':>8} {'size KB':>10} {'top-1 agree':>12} {'max diff':>10} {'b=1 ms':>8} {'b=32 ms':>8}")
+        for r in results:
+            if 'error' in r:
+                print(f"{r['format']:>8}  FAIL: {r['error']}")
+                continue
+            print(f"{r['format']:>8} {r['size_kb']:>10} {r['agreement']:>12} {r['max_abs_diff']:>10} "
+                  f"{r['batch1_ms']:>8} {r['batch32_ms']:>8}" + ('' if r.get('ok', True) else '  FAIL'))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
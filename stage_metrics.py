@@ -0,0 +1,112 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last
+# bucket catches everything slower
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_local = threading.local()
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as ``stage`` for the current thread's frame.
+
+    Spans accumulate, so a stage entered once per face adds up over the
+    frame. Collect them with ``take_spans`` once the frame is done.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans = getattr(_local, 'spans', None)
+        if spans is None:
+            spans = _local.spans = {}
+        spans[stage] = spans.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def take_spans():
+    """Stage -> milliseconds recorded on this thread since the last call"""
+    spans = getattr(_local, 'spans', None) or {}
+    _local.spans = {}
+    return spans
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; cheap to update and to merge"""
+
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self.bounds, self.counts)},
+            'overflow': self.counts[-1],
+        }
+
+
+class StageMetrics:
+    """Per-stage latency histograms for the emotion request path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, stage, ms):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(ms)
+
+    def observe_many(self, spans):
+        for stage, ms in spans.items():
+            self.observe(stage, ms)
+
+    @contextmanager
+    def timed(self, stage):
+        """Observe the enclosed block's duration as one ``stage`` sample"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - start) * 1000)
+
+    def histograms(self):
+        with self._lock:
+            return dict(self._histograms)
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: histogram.snapshot() for stage, histogram in sorted(self._histograms.items())}
+
+
+stage_metrics = StageMetrics()
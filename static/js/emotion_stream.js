@@ -0,0 +1,153 @@
+// emotion_stream.js - Sends webcam frames over one WebSocket, falling back to HTTP POST
+// Only one frame is in flight at a time: frames captured while waiting for a reply are
+// skipped, and a 'busy' reply from the server pauses sending for the time it asks for.
+// Each result also carries next_interval_ms, the server's recommended sampling delay.
+// Frames are downscaled, grayscaled and JPEG-encoded to the format the server
+// advertises at /api/emotion/capabilities before they are sent.
+class EmotionStream {
+    constructor(path = '/ws/emotion', fallbackUrl = '/api/emotion') {
+        this.path = path;
+        this.fallbackUrl = fallbackUrl;
+        this.socket = null;
+        this.waiting = null;
+        this.pausedUntil = 0;
+        this.nextIntervalMs = null;
+        this.frameScale = 1;
+        this.useHttp = !('WebSocket' in window);
+        // Used until the server's capabilities arrive
+        this.capabilities = { max_width: 480, jpeg_quality: 0.7, grayscale: true };
+        this.loadCapabilities();
+    }
+
+    loadCapabilities() {
+        fetch('/api/emotion/capabilities')
+            .then(response => response.ok ? response.json() : null)
+            .then(capabilities => {
+                if (!capabilities) return;
+                this.capabilities = capabilities;
+                if (capabilities.websocket) {
+                    this.path = capabilities.websocket;
+                } else {
+                    this.useHttp = true;
+                }
+            })
+            .catch(err => console.warn('Using default frame settings:', err));
+    }
+
+    // Canvas holding the current video frame at the advertised size, in grayscale if asked
+    drawFrame(video) {
+        const width = video.videoWidth || video.width || 640;
+        const height = video.videoHeight || video.height || 480;
+        const scale = Math.min(1, this.capabilities.max_width / width);
+        const canvas = document.createElement('canvas');
+        this.frameScale = scale;
+        canvas.width = Math.round(width * scale);
+        canvas.height = Math.round(height * scale);
+        const ctx = canvas.getContext('2d');
+        if (this.capabilities.grayscale) {
+            // Constant chroma compresses to a smaller JPEG; browsers without canvas filters send color
+            ctx.filter = 'grayscale(1)';
+        }
+        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+        return canvas;
+    }
+
+    encodeFrame(canvas) {
+        return new Promise((resolve, reject) => {
+            canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error('Could not encode frame')),
+                'image/jpeg', this.capabilities.jpeg_quality);
+        });
+    }
+
+    connect() {
+        if (this.useHttp || this.socket) return;
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${scheme}://${window.location.host}${this.path}`);
+        let opened = false;
+        socket.onopen = () => { opened = true; };
+        socket.onmessage = event => this.handleMessage(JSON.parse(event.data));
+        socket.onclose = () => {
+            this.socket = null;
+            // A socket that never opened means the server has no streaming endpoint
+            if (!opened) this.useHttp = true;
+            this.settle(null);
+        };
+        this.socket = socket;
+    }
+
+    handleMessage(message) {
+        if (message.type === 'busy') {
+            this.pausedUntil = Date.now() + (message.retry_after_ms || 1000);
+            this.settle(null);
+            return;
+        }
+        this.remember(message);
+        if (message.dropped) {
+            console.debug(`Server skipped ${message.dropped} stale frames so far`);
+        }
+        this.settle(message);
+    }
+
+    remember(data) {
+        if (data && data.next_interval_ms) {
+            this.nextIntervalMs = data.next_interval_ms;
+        }
+        // Face boxes come back in the downscaled frame's pixels; map them to the video's
+        if (data && data.face_coordinates && this.frameScale !== 1) {
+            data.face_coordinates = data.face_coordinates.map(face => ({
+                ...face,
+                x: face.x / this.frameScale,
+                y: face.y / this.frameScale,
+                width: face.width / this.frameScale,
+                height: face.height / this.frameScale
+            }));
+        }
+        return data;
+    }
+
+    // How long to wait before capturing the next frame
+    nextDelay(defaultMs) {
+        const interval = this.nextIntervalMs || defaultMs;
+        return Math.max(interval, this.pausedUntil - Date.now());
+    }
+
+    settle(value) {
+        if (this.waiting) {
+            const resolve = this.waiting;
+            this.waiting = null;
+            resolve(value);
+        }
+    }
+
+    // Resolves with the detection result, or null when the frame was skipped
+    analyze(blob) {
+        if (Date.now() < this.pausedUntil || this.waiting) {
+            return Promise.resolve(null);
+        }
+        this.connect();
+        if (!this.socket || this.socket.readyState !== WebSocket.OPEN) {
+            return this.post(blob);
+        }
+        return new Promise(resolve => {
+            this.waiting = resolve;
+            this.socket.send(blob);
+        });
+    }
+
+    post(blob) {
+        return fetch(this.fallbackUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'image/jpeg' },
+            body: blob
+        }).then(response => {
+            if (response.status === 503) {
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+                this.pausedUntil = Date.now() + retryAfter * 1000;
+                return null;
+            }
+            return response.json().then(data => this.remember(data));
+        });
+    }
+}
+
+window.emotionStream = window.emotionStream || new EmotionStream();
@@ -239,24 +239,11 @@ function startWebcamAndAnalyze(showPopups = false) {
           
           showDebugMessage(`Camera ready! Resolution: ${video.videoWidth}x${video.videoHeight}`);
           
-          // Start analysis with adaptive interval
-          let analysisInterval = 2000; // Start with 2 seconds
-          
+          // Analyze frames at the pace the server recommends (2 seconds until it says otherwise)
           const analysisLoop = () => {
             console.log('Running analysis loop...');
-            analyzeFrame(video, showPopups);
-            
-            // Adaptive interval based on detection success
-            const recentSuccess = moduleConcentrationData.concentratedChecks / Math.max(1, moduleConcentrationData.totalChecks);
-            if (recentSuccess > 0.7) {
-              analysisInterval = 3000; // Slow down if detection is good
-            } else if (recentSuccess < 0.3) {
-              analysisInterval = 1500; // Speed up if detection is poor
-            } else {
-              analysisInterval = 2000; // Default
-            }
-            
-            setTimeout(analysisLoop, analysisInterval);
+            Promise.resolve(analyzeFrame(video, showPopups))
+              .finally(() => setTimeout(analysisLoop, emotionStream.nextDelay(2000)));
           };
           
           // Start the analysis loop after a brief delay
@@ -358,17 +345,15 @@ window.checkCameraPermissions = function() {
 function analyzeFrame(video, showPopups = false) {
   console.log('analyzeFrame called, video ready:', video.readyState >= 2);
   
-  const canvas = document.createElement('canvas');
-  canvas.width = video.videoWidth || video.width || 640;
-  canvas.height = video.videoHeight || video.height || 480;
-  const ctx = canvas.getContext('2d');
-  
+  // Downscaled (and grayscale) copy of the frame in the format the server asks for
+  let canvas;
   try {
-    ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+    canvas = emotionStream.drawFrame(video);
   } catch (error) {
     console.error('Error drawing video to canvas:', error);
     return;
   }
+  const ctx = canvas.getContext('2d');
   
   // Enhance image quality before sending
   const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height);
@@ -383,20 +368,12 @@ function analyzeFrame(video, showPopups = false) {
   }
   
   ctx.putImageData(imageData, 0, 0);
-  const dataUrl = canvas.toDataURL('image/jpeg', 0.8); // Reduced quality for faster processing
-
   console.log('Sending image to backend for analysis...');
 
-  fetch('/api/emotion', {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ image: dataUrl })
-  })
-    .then(response => {
-      console.log('Response received from backend:', response.status);
-      return response.json();
-    })
+  return emotionStream.encodeFrame(canvas)
+    .then(blob => emotionStream.analyze(blob))
     .then(data => {
+      if (!data) return; // frame skipped while the previous one is being analyzed
       console.log('Backend response data:', data);
       
       const statusElement = document.getElementById('concentration-status');
@@ -75,31 +75,25 @@ function initializeCamera() {
 }
 
 function startEmotionAnalysis() {
-    setInterval(() => {
-        analyzeFrame();
-    }, 2000); // Analyze every 2 seconds
+    // Next frame after the reply, at the interval the server recommends (default 2 seconds)
+    const analysisLoop = () => {
+        Promise.resolve(analyzeFrame())
+            .finally(() => setTimeout(analysisLoop, emotionStream.nextDelay(2000)));
+    };
+    analysisLoop();
 }
 
 function analyzeFrame() {
     const video = document.getElementById('videoInput');
     if (!video || video.readyState < 2) return;
     
-    const canvas = document.createElement('canvas');
-    canvas.width = video.videoWidth || 640;
-    canvas.height = video.videoHeight || 480;
-    const ctx = canvas.getContext('2d');
-    
     try {
-        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-        const dataUrl = canvas.toDataURL('image/jpeg', 0.8);
-        
-        fetch('/api/emotion', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ image: dataUrl })
-        })
-        .then(response => response.json())
+        // Downscaled (and grayscale) frame in the format the server asks for
+        const canvas = emotionStream.drawFrame(video);
+        return emotionStream.encodeFrame(canvas)
+        .then(blob => emotionStream.analyze(blob))
         .then(data => {
+            if (!data) return; // frame skipped while the previous one is being analyzed
             updateUI(data, video);
         })
         .catch(err => {
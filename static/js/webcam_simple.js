@@ -85,8 +85,12 @@ function startFaceDetection() {
     status.innerText = 'Face detection active - Position your face in front of camera';
     status.className = 'badge bg-primary text-white py-2 px-3 mb-2 w-100 mt-2 text-center';
     
-    // Simple detection loop
-    setInterval(detectFace, 3000);
+    // Simple detection loop, paced by the server's recommended interval
+    const detectionLoop = () => {
+        Promise.resolve(detectFace())
+            .finally(() => setTimeout(detectionLoop, emotionStream.nextDelay(3000)));
+    };
+    detectionLoop();
 }
 
 function detectFace() {
@@ -98,25 +102,15 @@ function detectFace() {
         return;
     }
     
-    // Create canvas to capture frame
-    const canvas = document.createElement('canvas');
-    canvas.width = video.videoWidth || 640;
-    canvas.height = video.videoHeight || 480;
-    const ctx = canvas.getContext('2d');
-    
     try {
-        ctx.drawImage(video, 0, 0);
-        const dataUrl = canvas.toDataURL('image/jpeg', 0.7);
-        
+        // Capture a downscaled (and grayscale) frame in the format the server asks for
+        const canvas = emotionStream.drawFrame(video);
         console.log('Sending frame for analysis...');
         
-        fetch('/api/emotion', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ image: dataUrl })
-        })
-        .then(response => response.json())
+        return emotionStream.encodeFrame(canvas)
+        .then(blob => emotionStream.analyze(blob))
         .then(data => {
+            if (!data) return; // frame skipped while the previous one is being analyzed
             console.log('Detection result:', data);
             
             if (data.face_detected) {
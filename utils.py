@@ -1,16 +1,17 @@
 from db import (
     save_progress as db_save_progress,
-    save_emotion as db_save_emotion,
     get_student_data as db_get_student_data
 )
+from emotion_ingest import emotion_ingest
 
 
 def save_progress(user_id, course_id, status):
     db_save_progress(user_id, course_id, status)
 
 
-def save_emotion(user_id, emotion, timestamp):
-    db_save_emotion(user_id, emotion, timestamp)
+def save_emotion(user_id, emotion, timestamp, course_id=None, topic_id=None):
+    # Queued; the background writer persists it with the next batch
+    return emotion_ingest.submit(user_id, emotion, timestamp, course_id, topic_id)
 
 
 def get_student_data(user_id):